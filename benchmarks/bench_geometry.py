@@ -0,0 +1,78 @@
+"""
+Benchmark of the PageGeometry batch operations against the per-object code they replaced:
+border filtering of chars, cropping chars to a column and line bounding boxes.
+
+Run from the project root:
+    python -m benchmarks.bench_geometry
+"""
+import random
+import timeit
+
+from pdfplumber.utils import crop_to_bbox
+
+from extraction import PDFReader
+from extractors import PDFPlumberReader
+from geometry import PageGeometry, select
+
+
+def make_chars(char_count, seed=0):
+    """Chars of a dense two-column page, 600 x 800."""
+    rng = random.Random(seed)
+    chars = []
+    for i in range(char_count):
+        x0 = rng.uniform(10, 590)
+        top = rng.uniform(10, 790)
+        chars.append({'x0': x0, 'top': top, 'x1': x0 + 4.5, 'bottom': top + 8.0, 'doctop': top,
+                      'width': 4.5, 'height': 8.0, 'text': 'a'})
+    return chars
+
+
+def border_filter_per_object(reader, chars):
+    return [c for c in chars if all(reader.filter_by_coordinates(c))]
+
+
+def border_filter_batch(reader, chars):
+    return select(chars, PageGeometry.from_objects(chars).border_mask(reader.borders))
+
+
+def line_bboxes_per_object(lines):
+    return [[min(w['x0'] for w in line), min(w['top'] for w in line),
+             max(w['x1'] for w in line), max(w['bottom'] for w in line)] for line in lines]
+
+
+def line_bboxes_batch(lines):
+    return PageGeometry.from_objects(w for line in lines for w in line).group_bboxes([len(line) for line in lines])
+
+
+def main():
+    reader = PDFReader.__new__(PDFReader)
+    reader.borders = [50, 60, 550, 740]
+    crop_box = (0, 0, 305, 800)
+
+    def report(name, chars, old, new):
+        number = 5
+        old_time = min(timeit.repeat(old, number=number, repeat=3)) / number
+        new_time = min(timeit.repeat(new, number=number, repeat=3)) / number
+        print(f'{name:>14} {len(chars):>8} {old_time * 1000:>14.2f} {new_time * 1000:>10.2f} '
+              f'{old_time / new_time:>7.1f}x')
+
+    print(f"{'operation':>14} {'chars':>8} {'per object, ms':>14} {'batch, ms':>10} {'speedup':>8}")
+    for char_count in [1000, 5000, 20000]:
+        chars = make_chars(char_count)
+        lines = [chars[i:i + 12] for i in range(0, len(chars), 12)]
+        geometry = PageGeometry.from_objects(chars)
+
+        assert border_filter_per_object(reader, chars) == border_filter_batch(reader, chars)
+        assert [c['x0'] for c in crop_to_bbox(chars, crop_box)] == \
+            [c['x0'] for c in PDFPlumberReader.crop_chars(chars, geometry, crop_box)]
+        assert line_bboxes_per_object(lines) == line_bboxes_batch(lines)
+
+        report('borders', chars, lambda: border_filter_per_object(reader, chars),
+               lambda: border_filter_batch(reader, chars))
+        report('column crop', chars, lambda: crop_to_bbox(chars, crop_box),
+               lambda: PDFPlumberReader.crop_chars(chars, PageGeometry.from_objects(chars), crop_box))
+        report('line bboxes', chars, lambda: line_bboxes_per_object(lines), lambda: line_bboxes_batch(lines))
+
+
+if __name__ == '__main__':
+    main()
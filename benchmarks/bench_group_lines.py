@@ -0,0 +1,59 @@
+"""
+Benchmark of PDFPlumberReader.cluster_by_y against the previous linear scan over all lines.
+
+Run from the project root:
+    python -m benchmarks.bench_group_lines
+"""
+import random
+import timeit
+
+from extractors import PDFPlumberReader
+
+
+def cluster_by_y_linear(words, y_tolerance):
+    """Previous implementation: every word is compared with every existing line."""
+    lines_by_y = {}
+    for word in words:
+        y_key = None
+        for y in lines_by_y.keys():
+            if abs(word['top'] - y) <= y_tolerance:
+                y_key = y
+                break
+
+        if y_key is None:
+            y_key = word['top']
+            lines_by_y[y_key] = []
+
+        lines_by_y[y_key].append(word)
+
+    return [line[1] for line in sorted(lines_by_y.items())]
+
+
+def make_words(word_count, line_count, seed=0):
+    """Words of a dense page (table or reference list), in reading order with a small y jitter."""
+    rng = random.Random(seed)
+    words = []
+    for i in range(word_count):
+        line = i * line_count // word_count
+        words.append({'top': 40 + line * 7.5 + rng.uniform(-1, 1), 'text': f'w{i}'})
+    return words
+
+
+def main():
+    reader = PDFPlumberReader.__new__(PDFPlumberReader)
+    reader.y_tolerance = 3
+
+    print(f"{'words':>8} {'lines':>6} {'linear, ms':>11} {'bisect, ms':>11} {'speedup':>8}")
+    for word_count, line_count in [(1000, 60), (5000, 250), (10000, 500), (20000, 1000)]:
+        words = make_words(word_count, line_count)
+        assert cluster_by_y_linear(words, reader.y_tolerance) == reader.cluster_by_y(words)
+
+        number = 3
+        linear = min(timeit.repeat(lambda: cluster_by_y_linear(words, reader.y_tolerance), number=number, repeat=3))
+        bisect = min(timeit.repeat(lambda: reader.cluster_by_y(words), number=number, repeat=3))
+        print(f'{word_count:>8} {line_count:>6} {linear / number * 1000:>11.1f} {bisect / number * 1000:>11.1f} '
+              f'{linear / bisect:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Throughput benchmark over a synthetic corpus (see benchmarks.corpus): pages per second, per-line latency
+and peak RSS of write_file for every combination of reader, _mode, html_like, dehyphenate, output type and layout.
+
+Every combination runs in a fresh process, so peak RSS is its own. Per-line latency is the time between
+consecutive lines reaching the writer: mean, 95th percentile and maximum, plus the time to the first line.
+
+Results can be saved as a JSON baseline and later runs checked against it; the check fails (exit code 1)
+when pages/s drops or peak RSS grows by more than --threshold. Baselines depend on the machine, compare
+runs made on the same one.
+
+Run from the project root:
+    python -m benchmarks.bench_throughput --save benchmarks/baselines/throughput.json
+    python -m benchmarks.bench_throughput --check benchmarks/baselines/throughput.json
+    python -m benchmarks.bench_throughput --readers pymupdf --outputs jsonl,parquet --pages 50
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import LAYOUTS, make_corpus
+from writers import pyarrow
+
+try:
+    import resource
+except ImportError:
+    # Windows, peak RSS is not reported
+    resource = None
+
+
+READERS = ('pymupdf', 'pdfplumber')
+MODES = ('r', 'c')
+OUTPUTS = ('jsonl', 'txt', 'parquet', 'arrow', 'sqlite')
+OUTPUT_EXTENSIONS = {'sqlite': '.sqlite'}
+
+
+def case_key(case):
+    return '{layout}|{reader}|{mode}|html_like={html_like}|dehyphenate={dehyphenate}|{output}'.format(**case)
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(case):
+    """Extract one PDF with one combination of settings, in a fresh process. Returns the measurements."""
+    from extractors import PDFPlumberReader, PyMuPDFReader
+
+    reader_class = PyMuPDFReader if case['reader'] == 'pymupdf' else PDFPlumberReader
+    output_path = os.path.join(case['directory'], 'out' + OUTPUT_EXTENSIONS.get(case['output'], '.' + case['output']))
+    reader = reader_class(case['pdf'], output_path, _mode=case['mode'], html_like=case['html_like'],
+                          dehyphenate=case['dehyphenate'], print_logs=False)
+
+    # Time every line as write_file receives it
+    times = []
+    iterator_name = 'iter_txt' if case['output'] == 'txt' else 'iter_records'
+    iterate = getattr(reader, iterator_name)
+
+    def timed_iterate(app=None):
+        for item in iterate(app):
+            times.append(time.perf_counter())
+            yield item
+
+    setattr(reader, iterator_name, timed_iterate)
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    reader.write_file(filetype=case['output'])
+    elapsed = time.perf_counter() - start
+
+    gaps = sorted(b - a for a, b in zip(times, times[1:]))
+    pages = reader.total_pages
+    return {
+        'pages': pages,
+        'lines': len(times),
+        'seconds': elapsed,
+        'pages_per_second': pages / elapsed,
+        'first_line_ms': (times[0] - start) * 1000 if times else None,
+        'line_latency_mean_us': (sum(gaps) / len(gaps)) * 1e6 if gaps else None,
+        'line_latency_p95_us': gaps[int(len(gaps) * 0.95)] * 1e6 if gaps else None,
+        'line_latency_max_us': gaps[-1] * 1e6 if gaps else None,
+        'rss_before_mb': rss_before,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def make_cases(corpus, readers, outputs, modes=MODES):
+    cases = []
+    for (layout, pdf), reader, mode, html_like, dehyphenate, output in itertools.product(
+            corpus.items(), readers, modes, (True, False), (True, False), outputs):
+        cases.append({'layout': layout, 'pdf': pdf, 'reader': reader, 'mode': mode, 'html_like': html_like,
+                      'dehyphenate': dehyphenate, 'output': output})
+    return cases
+
+
+def compare(results, baseline, threshold):
+    """
+    Regressions of results against a baseline.
+
+    Returns:
+        list: Messages, one per combination slower or larger than the baseline by more than threshold
+    """
+    failures = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if result['pages_per_second'] < reference['pages_per_second'] * (1 - threshold):
+            failures.append(f"{key}: {result['pages_per_second']:.1f} pages/s, "
+                            f"baseline {reference['pages_per_second']:.1f}")
+        if result['peak_rss_mb'] and reference.get('peak_rss_mb') and \
+                result['peak_rss_mb'] > reference['peak_rss_mb'] * (1 + threshold):
+            failures.append(f"{key}: peak RSS {result['peak_rss_mb']:.0f} MB, baseline {reference['peak_rss_mb']:.0f}")
+    return failures
+
+
+def environment():
+    import fitz
+    import pdfplumber
+    return {
+        'platform': platform.platform(),
+        'machine': platform.node(),
+        'python': platform.python_version(),
+        'pymupdf': fitz.VersionBind,
+        'pdfplumber': pdfplumber.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=10, help='pages per synthetic PDF')
+    parser.add_argument('--layouts', default=','.join(LAYOUTS))
+    parser.add_argument('--readers', default=','.join(READERS))
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--outputs', default=','.join(OUTPUTS),
+                        help=f"comma separated, from {','.join(OUTPUTS)} (parquet and arrow need pyarrow)")
+    parser.add_argument('--corpus', help='directory for the generated PDFs, kept between runs')
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--check', help='compare with a JSON baseline, exit with 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative drop of pages/s and growth of peak RSS (default 0.25)')
+    args = parser.parse_args()
+    outputs = args.outputs.split(',')
+    if pyarrow is None and {'parquet', 'arrow'} & set(outputs):
+        print('pyarrow is not installed, skipping parquet and arrow outputs')
+        outputs = [output for output in outputs if output not in ('parquet', 'arrow')]
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = make_corpus(args.corpus or directory, args.pages, args.layouts.split(','))
+        cases = make_cases(corpus, args.readers.split(','), outputs, args.modes.split(','))
+        for case in cases:
+            case['directory'] = directory
+
+        print(f"{len(cases)} runs, {args.pages} pages per PDF")
+        print(f"{'layout':>11} {'reader':>10} {'mode':>4} {'html':>5} {'dehy':>5} {'output':>7} "
+              f"{'pages/s':>8} {'lines':>6} {'first ms':>8} {'mean us':>8} {'p95 us':>8} {'max ms':>7} {'RSS MB':>7}")
+        results = {}
+        # One process per run, started fresh so peak RSS is measured per run
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            for case, result in zip(cases, pool.imap(run_case, cases)):
+                results[case_key(case)] = result
+                print(f"{case['layout']:>11} {case['reader']:>10} {case['mode']:>4} {str(case['html_like']):>5} "
+                      f"{str(case['dehyphenate']):>5} {case['output']:>7} {result['pages_per_second']:>8.1f} "
+                      f"{result['lines']:>6} {result['first_line_ms'] or 0:>8.1f} "
+                      f"{result['line_latency_mean_us'] or 0:>8.0f} {result['line_latency_p95_us'] or 0:>8.0f} "
+                      f"{(result['line_latency_max_us'] or 0) / 1000:>7.1f} {result['peak_rss_mb'] or 0:>7.0f}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'pages': args.pages, 'results': results}, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if args.check:
+        with open(args.check, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('pages') != args.pages:
+            print(f"Warning: baseline was made with {baseline.get('pages')} pages per PDF, this run with {args.pages}")
+        failures = compare(results, baseline['results'], args.threshold)
+        missing = len(set(results) - set(baseline['results']))
+        print(f"Checked {len(results) - missing} runs against {args.check}" +
+              (f", {missing} not in the baseline" if missing else ''))
+        if failures:
+            print(f"{len(failures)} regressions beyond {args.threshold:.0%}:")
+            for failure in failures:
+                print('  ' + failure)
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
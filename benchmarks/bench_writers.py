@@ -0,0 +1,123 @@
+"""
+Benchmark of the JSONL output writer against the previous one (json.dumps and a text-mode write per line),
+and of JSONL with a style table (StyleTableEncoder) and columnar Parquet/Arrow (ArrowLineWriter, if pyarrow
+is installed) against plain JSONL: file size, writing and reading back.
+
+Run from the project root:
+    python -m benchmarks.bench_writers
+"""
+import json
+import os
+import random
+import tempfile
+import time
+
+from records import LineRecord
+from writers import (ArrowLineWriter, LineEncoder, StyleTableEncoder, open_output, orjson, pyarrow, read_lines,
+                     write_batches, zstandard)
+
+
+def make_lines(line_count, seed=0):
+    """Line dicts shaped like extraction output."""
+    rng = random.Random(seed)
+    words = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', '<b>adipiscing</b>', 'elit', 'sed', 'ñandú']
+    lines = []
+    for i in range(line_count):
+        x0 = rng.uniform(30, 300)
+        top = rng.uniform(30, 780)
+        lines.append({
+            'text': ' '.join(rng.choice(words) for _ in range(rng.randint(4, 14))),
+            'font': ['MinionPro-Regular', 'MinionPro-Bold'][:rng.randint(1, 2)],
+            'size': [9.5],
+            'color': ['0'],
+            'bbox': [x0, top, x0 + rng.uniform(50, 250), top + 11.2],
+            'page': i // 50,
+            '_id': i,
+        })
+    return lines
+
+
+def write_previous(path, lines):
+    with open(path, 'wt', encoding='utf-8') as f:
+        for item in lines:
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+def write_current(path, lines, json_encoder, style_table=False):
+    encoder = StyleTableEncoder(json_encoder) if style_table else LineEncoder('jsonl', json_encoder)
+    with open_output(path) as f:
+        write_batches(f, lines, encoder.encode_batch)
+
+
+def write_columnar(path, records, filetype):
+    with ArrowLineWriter(path, filetype) as writer:
+        for record in records:
+            writer.write(record)
+
+
+def read_columnar(path, filetype):
+    if filetype == 'parquet':
+        return pyarrow.parquet.read_table(path)
+    with pyarrow.memory_map(path) as source:
+        return pyarrow.ipc.open_file(source).read_all()
+
+
+def main():
+    lines = make_lines(200000)
+    records = [LineRecord.from_dict(line) for line in lines]
+    encoders = ['json'] + (['orjson'] if orjson is not None else [])
+    extensions = ['.jsonl', '.jsonl.gz'] + (['.jsonl.zst'] if zstandard is not None else [])
+    cases = [('previous', '.jsonl', None, False)]
+    cases += [(encoder, extension, encoder, False) for encoder in encoders for extension in extensions]
+    cases += [(encoder + '+st', extension, encoder, True) for encoder in encoders for extension in extensions]
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Throughput in MB of uncompressed JSONL per second
+        reference = os.path.join(directory, 'reference.jsonl')
+        write_previous(reference, lines)
+        size = os.path.getsize(reference) / 1024 / 1024
+
+        print(f"{len(lines)} lines, {size:.1f} MB of JSONL")
+        print("+st: with style table; MB/s of plain JSONL; read: read_lines back to dicts")
+        print(f"{'encoder':>10} {'output':>10} {'seconds':>8} {'MB/s':>7} {'file MB':>8} {'read s':>7}")
+        for encoder, extension, json_encoder, style_table in cases:
+            path = os.path.join(directory, 'out' + extension)
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                if json_encoder is None:
+                    write_previous(path, lines)
+                else:
+                    # LineRecords, as write_file passes them
+                    write_current(path, records, json_encoder, style_table)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            start = time.perf_counter()
+            count = sum(1 for _ in read_lines(path))
+            read_time = time.perf_counter() - start
+            assert count == len(lines)
+            print(f'{encoder:>10} {extension:>10} {best:>8.2f} {size / best:>7.1f} '
+                  f'{os.path.getsize(path) / 1024 / 1024:>8.1f} {read_time:>7.2f}')
+
+        if pyarrow is None:
+            return
+        # Columnar output, read back as a table (what a dataframe loader does)
+        for filetype in ['parquet', 'arrow']:
+            path = os.path.join(directory, 'out.' + filetype)
+            best = min(_timed(write_columnar, path, records, filetype) for _ in range(3))
+            start = time.perf_counter()
+            assert read_columnar(path, filetype).num_rows == len(lines)
+            read_time = time.perf_counter() - start
+            print(f"{'pyarrow':>10} {'.' + filetype:>10} {best:>8.2f} {size / best:>7.1f} "
+                  f'{os.path.getsize(path) / 1024 / 1024:>8.1f} {read_time:>7.2f}')
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Deterministic synthetic PDFs for the benchmarks: the same layout, seed and page count always give the same text.
+
+Layouts:
+    one_column   - body text with bold and italic runs, superscript references and hyphenated line ends
+    two_columns  - the same text in two columns
+    tables       - dense ruled tables of short cells in a small font
+
+Every page has a running header and a page number footer, so border settings have something to remove.
+
+Run from the project root to write the corpus to a directory:
+    python -m benchmarks.corpus out_dir --pages 20
+"""
+import argparse
+import os
+import random
+
+import fitz
+
+
+LAYOUTS = ('one_column', 'two_columns', 'tables')
+
+PAGE_RECT = fitz.paper_rect('a4')
+MARGIN = 56
+GUTTER = 20
+
+WORDS = ('la', 'de', 'el', 'que', 'en', 'paciente', 'síndrome', 'inflamatoria', 'mediterránea', 'tratamiento',
+         'the', 'of', 'and', 'patient', 'response', 'interleukin', 'autoinflammatory', 'consistent', 'with',
+         'fiebre', 'familiar', 'mutación', 'genético', 'receptor', 'dosis', 'semanas', 'clinical', 'observed',
+         'corticosteroids', 'inhibitors', 'presentation', 'diagnóstico', 'evolución', 'symptoms', 'análisis')
+
+# Body font, bold, italic; regular text mostly, with runs of bold and italic words
+FAMILIES = (('tiro', 'tibo', 'tiit'), ('helv', 'hebo', 'heit'))
+
+
+class _Fonts:
+    def __init__(self):
+        self._fonts = {}
+
+    def __getitem__(self, name):
+        font = self._fonts.get(name)
+        if font is None:
+            font = self._fonts[name] = fitz.Font(name)
+        return font
+
+
+def _write_paragraphs(writer, fonts, rng, rect, size):
+    """Fill rect with paragraphs, line by line; returns the number of lines written."""
+    regular, bold, italic = rng.choice(FAMILIES)
+    leading = size * 1.3
+    x, y = rect.x0, rect.y0 + size
+    line_count = 0
+    style, style_left = regular, 0
+    while y <= rect.y1:
+        # A paragraph of 3-8 lines
+        paragraph_lines = rng.randint(3, 8)
+        x = rect.x0 + size * 2
+        while paragraph_lines and y <= rect.y1:
+            word = rng.choice(WORDS)
+            if style_left == 0:
+                style = rng.choices((regular, bold, italic), weights=(8, 1, 1))[0]
+                style_left = rng.randint(1, 4)
+            style_left -= 1
+            font = fonts[style]
+            width = font.text_length(word + ' ', size)
+
+            if x + width > rect.x1:
+                # Hyphenate long words that do not fit, move the rest to the next line
+                head = word[:len(word) // 2]
+                if len(word) > 7 and x + font.text_length(head + '-', size) <= rect.x1:
+                    writer.append((x, y), head + '-', font=font, fontsize=size)
+                    word = word[len(head):]
+                    width = font.text_length(word + ' ', size)
+                x = rect.x0
+                y += leading
+                line_count += 1
+                paragraph_lines -= 1
+                if not paragraph_lines or y > rect.y1:
+                    break
+
+            writer.append((x, y), word, font=font, fontsize=size)
+            x += width
+            # Superscript reference number after some words
+            if rng.random() < 0.03:
+                sup = str(rng.randint(1, 40))
+                writer.append((x - size * 0.2, y - size * 0.35), sup, font=fonts[regular], fontsize=size * 0.55)
+                x += fonts[regular].text_length(sup + ' ', size * 0.55)
+        y += leading * 1.5
+    return line_count
+
+
+def _write_tables(page, writer, fonts, rng, rect):
+    """Fill rect with ruled tables of numbers and short labels."""
+    size = 6.5
+    row_height = size * 1.6
+    y = rect.y0
+    while y + row_height * 4 <= rect.y1:
+        columns = rng.randint(5, 10)
+        rows = rng.randint(6, 30)
+        column_width = rect.width / columns
+        for row in range(rows):
+            if y + row_height > rect.y1:
+                break
+            font = fonts['hebo'] if row == 0 else fonts['helv']
+            for column in range(columns):
+                if row == 0:
+                    cell = rng.choice(WORDS)[:8]
+                elif column == 0:
+                    cell = rng.choice(WORDS)[:10]
+                else:
+                    cell = f'{rng.uniform(0, 1000):.{rng.randint(0, 2)}f}'
+                writer.append((rect.x0 + column * column_width + 2, y + size * 1.2), cell, font=font, fontsize=size)
+            page.draw_line((rect.x0, y), (rect.x1, y), width=0.3)
+            y += row_height
+        page.draw_line((rect.x0, y), (rect.x1, y), width=0.3)
+        for column in range(columns + 1):
+            x = rect.x0 + column * column_width
+            page.draw_line((x, y - row_height * min(rows, row + 1)), (x, y), width=0.3)
+        y += row_height * 2
+
+
+def make_pdf(path, layout='one_column', pages=10, seed=0):
+    """
+    Write a synthetic PDF.
+
+    Args:
+        path (str): Output PDF path
+        layout (str): One of LAYOUTS
+        pages (int): Number of pages
+        seed (int): Random seed, the text depends only on layout, pages and seed
+
+    Returns:
+        str: path
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}, expected one of {LAYOUTS}")
+    rng = random.Random(f'{layout}-{seed}')
+    fonts = _Fonts()
+    doc = fitz.open()
+    body = fitz.Rect(MARGIN, MARGIN + 20, PAGE_RECT.width - MARGIN, PAGE_RECT.height - MARGIN - 20)
+
+    for page_num in range(pages):
+        page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+        writer = fitz.TextWriter(page.rect)
+        writer.append((MARGIN, MARGIN), f'Synthetic corpus - {layout}', font=fonts['heit'], fontsize=8)
+        writer.append((PAGE_RECT.width / 2, PAGE_RECT.height - MARGIN), str(page_num + 1), font=fonts['helv'],
+                      fontsize=8)
+
+        if layout == 'one_column':
+            _write_paragraphs(writer, fonts, rng, body, 9.5)
+        elif layout == 'two_columns':
+            column_width = (body.width - GUTTER) / 2
+            for column in range(2):
+                x0 = body.x0 + column * (column_width + GUTTER)
+                _write_paragraphs(writer, fonts, rng, fitz.Rect(x0, body.y0, x0 + column_width, body.y1), 8)
+        else:
+            _write_tables(page, writer, fonts, rng, body)
+        writer.write_text(page)
+
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def make_corpus(directory, pages=10, layouts=LAYOUTS, seed=0):
+    """
+    Write one PDF per layout, reusing files that already exist.
+
+    Returns:
+        dict: {layout: path}
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for layout in layouts:
+        path = os.path.join(directory, f'{layout}-{pages}p-s{seed}.pdf')
+        if not os.path.exists(path):
+            make_pdf(path, layout, pages, seed)
+        paths[layout] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory')
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for layout, path in make_corpus(args.directory, args.pages, seed=args.seed).items():
+        print(layout, path)
+
+
+if __name__ == '__main__':
+    main()
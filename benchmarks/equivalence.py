@@ -0,0 +1,219 @@
+"""
+Randomized equivalence checks of optimized code paths against the implementations they replaced.
+
+Each check builds random inputs from a seed, runs the old and the new code and stops at the first input
+where they differ, printing it. Run from the project root:
+    python -m benchmarks.equivalence [--cases 20000] [--seed 0] [check ...]
+"""
+import argparse
+import pickle
+import random
+import re
+import sys
+import unicodedata
+
+from benchmarks.bench_group_lines import cluster_by_y_linear
+from extractors import PDFPlumberReader, PyMuPDFReader
+from formatting import BOLD, ITALIC, SUP, LineBuilder, consolidate_formatting
+from records import LineBatch, LineRecord, pack_page_lines
+from styles import StyleResolver
+
+
+def _random_run(rng):
+    """Text of a run (span or word), with the characters the formatting code treats specially."""
+    kind = rng.random()
+    if kind < 0.05:
+        return rng.choice(['', ' ', '  ', '\t'])
+    if kind < 0.1:
+        return rng.choice(['’', ' ’ ', '’ '])
+    if kind < 0.15:
+        # Combining marks, attached to the previous run
+        return rng.choice(['\u0301', '\u0308', '\u0327\u0301'])
+    if kind < 0.18:
+        return rng.choice(['<', 'a<b', '</b>', '<i>x'])
+    alphabet = 'abcxyzñé’ ,.-'
+    text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 8)))
+    if rng.random() < 0.2:
+        text = rng.choice([' ', '  ']) + text
+    if rng.random() < 0.2:
+        text += rng.choice([' ', '  '])
+    return text
+
+
+def check_line_builder(rng):
+    """LineBuilder.build() against wrapping every run in its tags and running consolidate_formatting."""
+    builder = LineBuilder()
+    styles = [0, BOLD, ITALIC, SUP, BOLD | ITALIC, BOLD | SUP, ITALIC | SUP, BOLD | ITALIC | SUP]
+    plain = rng.random() < 0.2
+    for _ in range(rng.randint(0, 8)):
+        builder.add(_random_run(rng), 0 if plain else rng.choice(styles))
+
+    # The previous readers wrapped each run in its tags, joined the runs with spaces and glued combining
+    # marks to the previous run
+    parts = []
+    for text, style in zip(builder.texts, builder.styles):
+        combining = bool(text) and all(unicodedata.category(c) in ('Mn', 'Mc') for c in text)
+        if style & SUP:
+            text = f'<sup>{text}</sup>'
+        if style & BOLD:
+            text = f'<b>{text}</b>'
+        if style & ITALIC:
+            text = f'<i>{text}</i>'
+        if combining and parts:
+            parts[-1] += text
+        else:
+            parts.append(text)
+    expected = consolidate_formatting(' '.join(parts))
+    actual = builder.build()
+    if actual != expected:
+        return {'runs': list(zip(builder.texts, builder.styles)), 'expected': expected, 'actual': actual}
+    return None
+
+
+def _random_text(rng):
+    alphabet = ['a', 'ñ', ' ', '\n', '<b>', '’', '\xad', '\u0301', '\U0001F600', '\ud800', '\x00']
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+
+
+def check_line_batch(rng):
+    """Lines sent back from a worker as a packed LineBatch against pickling the LineRecords."""
+    fonts = ['Times-Roman', 'Times-Bold', 'ÅrialÜ', '']
+    colors = ['0', '(0, 0, 1)', '16711680']
+    lines = []
+    for line_id in range(rng.randint(0, 20)):
+        sizes = tuple(rng.choice([9, 9.0, 9.5, 0, -1.25, 1e300, 12]) for _ in range(rng.randint(0, 3)))
+        bbox = tuple(rng.choice([rng.uniform(-1000, 1000), 0.0, 1e-320, float(rng.randint(0, 800))])
+                     for _ in range(4))
+        lines.append(LineRecord(_random_text(rng), tuple(rng.sample(fonts, rng.randint(0, 3))), sizes,
+                                tuple(rng.sample(colors, rng.randint(0, 2))), bbox, rng.randint(0, 5000), line_id))
+    id_count = len(lines) + rng.randint(0, 3)
+    id_offset = rng.randint(0, 10 ** 6)
+
+    expected = [line.copy() for line in pickle.loads(pickle.dumps(lines))]
+    for line in expected:
+        line._id += id_offset
+    batch, packed_count = pickle.loads(pickle.dumps(pack_page_lines((lines, id_count))))
+    actual = list(batch.iter_lines(id_offset))
+
+    def types(line):
+        return [type(value) for value in (line.text, line.page, line._id, *line.size, *line.bbox)]
+
+    if (not isinstance(batch, LineBatch) or packed_count != id_count or len(batch) != len(expected)
+            or actual != expected or [types(line) for line in actual] != [types(line) for line in expected]):
+        return {'lines': [line.to_dict() for line in lines], 'expected': [line.to_dict() for line in expected],
+                'actual': [line.to_dict() for line in actual]}
+    return None
+
+
+def check_cluster_by_y(rng):
+    """PDFPlumberReader.cluster_by_y (bisect) against the previous scan over all lines."""
+    reader = PDFPlumberReader.__new__(PDFPlumberReader)
+    reader.y_tolerance = rng.choice([0, 0.5, 1.5, 3, 10, -1])
+    # Few distinct tops, so words often tie or sit exactly on the tolerance
+    tops = [rng.choice([rng.uniform(0, 60), float(rng.randint(0, 60)), rng.randint(0, 20) * 1.5])
+            for _ in range(rng.randint(1, 15))]
+    words = [{'top': rng.choice(tops), 'text': f'w{i}'} for i in range(rng.randint(0, 60))]
+
+    expected = [[word['text'] for word in line] for line in cluster_by_y_linear(words, reader.y_tolerance)]
+    actual = [[word['text'] for word in line] for line in reader.cluster_by_y(words)]
+    if actual != expected:
+        return {'y_tolerance': reader.y_tolerance, 'tops': [word['top'] for word in words],
+                'expected': expected, 'actual': actual}
+    return None
+
+
+def check_style_resolver(rng):
+    """StyleResolver lookups against the inline font checks of both readers it replaced."""
+    bold_fonts = ['Bold', '.B', '.BI']
+    italic_fonts = ['Italic', '.I', '.BI']
+    sup_size = 6
+    pymupdf = PyMuPDFReader.__new__(PyMuPDFReader)
+    resolvers = {reader: StyleResolver(bold_fonts, italic_fonts, sup_size, reader.font_suffix_pattern)
+                 for reader in (PyMuPDFReader, PDFPlumberReader)}
+    names = ['Times', 'Times-Bold', 'Arial.BI', 'Helv.I', 'NJHPPA+AdvOT863180fb', 'AdvOT863180fb+20',
+             'ABC+Font+3', 'Font+x', '+12', '', 'BoldItalic', 'AB+Times-Bold+7']
+    for _ in range(20):
+        font, other = rng.choice(names), rng.choice(names)
+        size = rng.choice([5, 5.99, 6, 6.0, 9.5, 0])
+        flags = rng.randint(0, 2 ** 11 - 1)
+
+        # PyMuPDFReader.get_lines_by_blocks
+        word_flags = pymupdf.flags_decomposer(flags)
+        style = 0
+        if size < sup_size:
+            style |= SUP
+        if any(marker in font for marker in bold_fonts) or 'bold' in word_flags:
+            style |= BOLD
+        if any(marker in font for marker in italic_fonts) or 'italic' in word_flags:
+            style |= ITALIC
+        if '+' in font or '+' in other:
+            same_font = re.sub(r'\+\d+|', '', font) == re.sub(r'\+\d+', '', other)
+        else:
+            same_font = font == other
+        resolver = resolvers[PyMuPDFReader]
+        if (resolver.get_style(font, size, flags) != style
+                or (resolver.get_font_id(font) == resolver.get_font_id(other)) != same_font):
+            return {'reader': 'pymupdf', 'font': font, 'other': other, 'size': size, 'flags': flags}
+
+        # PDFPlumberReader.group_words and store_lines: no flags, subset prefixes removed too
+        style &= ~(BOLD | ITALIC)
+        if any(marker in font for marker in bold_fonts):
+            style |= BOLD
+        if any(marker in font for marker in italic_fonts):
+            style |= ITALIC
+        if '+' in font or '+' in other:
+            same_font = re.sub(r'^[A-Z]+\+|\+\d+', '', font) == re.sub(r'^[A-Z]+\+|\+\d+', '', other)
+        else:
+            same_font = font == other
+        resolver = resolvers[PDFPlumberReader]
+        if (resolver.get_style(font, size) != style
+                or (resolver.get_font_id(font) == resolver.get_font_id(other)) != same_font
+                or resolver.get_clean_name(font) != PDFPlumberReader.clean_font_name(font)):
+            return {'reader': 'pdfplumber', 'font': font, 'other': other, 'size': size}
+    return None
+
+
+CHECKS = {
+    'line_builder': check_line_builder,
+    'line_batch': check_line_batch,
+    'cluster_by_y': check_cluster_by_y,
+    'style_resolver': check_style_resolver,
+}
+
+
+def run_check(check, cases, seed):
+    """
+    Returns:
+        dict: The first differing case, or None if all cases agree
+    """
+    rng = random.Random(seed)
+    for case in range(cases):
+        difference = check(rng)
+        if difference is not None:
+            return {'case': case, **difference}
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('checks', nargs='*', help=f"checks to run, all by default: {', '.join(CHECKS)}")
+    parser.add_argument('--cases', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown checks: {', '.join(unknown)}")
+
+    failed = False
+    for name in args.checks or CHECKS:
+        difference = run_check(CHECKS[name], args.cases, args.seed)
+        if difference is None:
+            print(f'{name}: {args.cases} cases equal')
+        else:
+            failed = True
+            print(f'{name}: differs {difference}')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
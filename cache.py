@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import pathlib
+import pickle
+import shutil
+
+
+class ExtractionCache:
+    """
+    On-disk cache of per-page extraction results.
+
+    Entries are keyed by a hash of the PDF bytes, a hash of the normalized reader parameters and the
+    page number, so a run over an overlapping page range reuses the pages already extracted.
+    The total size is bounded, least recently used entries are evicted first.
+
+    Layout: <directory>/<pdf hash>/<parameters hash>/<kind>-<page>.pkl
+    """
+
+    # Bump when extraction output changes, so old entries are not reused
+    VERSION = 2
+
+    def __init__(self, directory=None, max_bytes=512 * 1024 * 1024):
+        if directory is None:
+            directory = os.path.join(pathlib.Path(__file__).parent.absolute(), 'extraction_cache')
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self._sizes = None
+
+    def __getstate__(self):
+        # Only the location travels to worker processes, the size index is rebuilt on demand
+        return {'directory': self.directory, 'max_bytes': self.max_bytes, '_sizes': None}
+
+    @staticmethod
+    def hash_document(pdf, is_stream=False):
+        """
+        Hash the PDF content.
+
+        Args:
+            pdf: File path, or PDF bytes if is_stream
+            is_stream (bool): Whether pdf holds the document bytes
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256()
+        if is_stream:
+            digest.update(pdf)
+        else:
+            with open(pdf, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    @classmethod
+    def hash_parameters(cls, parameters):
+        """
+        Hash reader parameters. Values are normalized, so 3 and 3.0 give the same key.
+
+        Args:
+            parameters (dict): Parameters that affect the extraction output
+
+        Returns:
+            str: Hex digest
+        """
+        def normalize(value):
+            if isinstance(value, bool) or value is None or isinstance(value, str):
+                return value
+            if isinstance(value, (int, float)):
+                return float(value)
+            if isinstance(value, (list, tuple)):
+                return [normalize(item) for item in value]
+            return str(value)
+
+        normalized = {key: normalize(value) for key, value in parameters.items()}
+        normalized['_cache_version'] = cls.VERSION
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+    def _entry_path(self, document_key, parameters_key, kind, page_num):
+        return self.directory / document_key / parameters_key / f'{kind}-{page_num}.pkl'
+
+    def contains(self, document_key, parameters_key, kind, page_num):
+        return self._entry_path(document_key, parameters_key, kind, page_num).is_file()
+
+    def get(self, document_key, parameters_key, kind, page_num, default=None):
+        """
+        Load a cached page result.
+
+        Returns:
+            The stored result, or default if there is no entry
+        """
+        path = self._entry_path(document_key, parameters_key, kind, page_num)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+        try:
+            # Access time for LRU eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, document_key, parameters_key, kind, page_num, result):
+        """Store a page result, evicting old entries if the cache grows over max_bytes."""
+        path = self._entry_path(document_key, parameters_key, kind, page_num)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Write to a temporary file first, so readers never see a partial entry
+        temp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        sizes = self._get_sizes()
+        sizes[path] = len(data)
+        if sum(sizes.values()) > self.max_bytes:
+            self._evict()
+
+    def _get_sizes(self):
+        if self._sizes is None:
+            self._sizes = {}
+            if self.directory.is_dir():
+                for path in self.directory.glob('*/*/*.pkl'):
+                    try:
+                        self._sizes[path] = path.stat().st_size
+                    except OSError:
+                        pass
+        return self._sizes
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is below 90% of max_bytes."""
+        sizes = self._get_sizes()
+        entries = []
+        for path in list(sizes):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                del sizes[path]
+        entries.sort()
+
+        total = sum(sizes.values())
+        limit = self.max_bytes * 0.9
+        for mtime, path in entries:
+            if total <= limit:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= sizes.pop(path)
+
+    def invalidate(self, document_key=None):
+        """
+        Remove cached entries.
+
+        Args:
+            document_key (str): Only remove entries of this document (see hash_document); all if None
+        """
+        target = self.directory / document_key if document_key else self.directory
+        shutil.rmtree(target, ignore_errors=True)
+        self._sizes = None
+
+    def size(self):
+        """Total size of cached entries in bytes."""
+        return sum(self._get_sizes().values())
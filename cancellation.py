@@ -0,0 +1,38 @@
+import threading
+
+
+class ExtractionCancelled(Exception):
+    """Raised by a reader's page loop when its CancelToken was cancelled."""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation of a reader run, e.g. from a GUI thread; the GUI's Cancel button cancels
+    the running extraction this way.
+
+    The reader checks the token between pages, and while waiting for worker processes. A cancelled run
+    stops its workers and raises ExtractionCancelled; pages already finished, up to the first unfinished
+    one, are still written by write_file.
+
+        token = CancelToken()
+        reader = PyMuPDFReader(pdf_path, output_path, cancel=token)
+        # On another thread:
+        token.cancel('Cancelled by user')
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason='Cancelled'):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ExtractionCancelled(self.reason)
@@ -0,0 +1,244 @@
+"""
+Compare PyMuPDFReader and PDFPlumberReader on the same pages: lines one reader found and the other missed,
+replacement glyphs, differing text, and the time each reader spent.
+
+Lines are aligned by page and position: a line of one reader is compared with the lines of the other reader
+whose bounding boxes intersect it (within a tolerance, the libraries' coordinates differ by a few points).
+PyMuPDF lines carry the bbox of their block and PDFPlumber may merge lines of neighbouring columns, so lines
+are matched by their words rather than one to one.
+
+There is no ground truth: each reader is scored against the other. word_recall of a reader is the share of
+the other reader's words it found near the same position; missing_lines counts the other reader's lines it
+has less than half the words of.
+
+Run from the project root:
+    python -m comparison file.pdf [more.pdf ...] --json report.json --min-word-recall 0.99
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from extractors import PDFPlumberReader, PyMuPDFReader
+from geometry import PageGeometry
+
+
+READERS = {'pymupdf': PyMuPDFReader, 'pdfplumber': PDFPlumberReader}
+
+# U+FFFD, soft hyphens PyMuPDF puts in place of lines it could not read, and pdfminer's unmapped glyphs
+_replacement_pattern = re.compile(r'\ufffd|\u00ad|\(cid:\d+\)')
+_tag_pattern = re.compile(r'</?[a-z]+>')
+_word_pattern = re.compile(r'\w+')
+
+
+def count_replacement_glyphs(text):
+    return len(_replacement_pattern.findall(text))
+
+
+def get_words(text):
+    """Words of a line without formatting tags; spacing and punctuation are ignored."""
+    return _word_pattern.findall(_tag_pattern.sub('', text))
+
+
+def run_reader(reader_class, pdf_path, **reader_kwargs):
+    """
+    Extract a document, grouping lines by page and timing each page.
+
+    A page's time is the time from the previous page's lines to its own, so pages without lines
+    are counted in the next page that has some.
+
+    Returns:
+        tuple: ({page: [LineRecord]}, {page: seconds}, total seconds)
+    """
+    reader = reader_class(pdf_path, '', print_logs=False, **reader_kwargs)
+    lines = {}
+    seconds = {}
+    start = last = time.perf_counter()
+    for record in reader.iter_records():
+        if record.page not in lines:
+            now = time.perf_counter()
+            lines[record.page] = []
+            seconds[record.page] = now - last
+            last = now
+        lines[record.page].append(record)
+    return lines, seconds, time.perf_counter() - start
+
+
+def _find_words(lines, others, tolerance):
+    """
+    For each line, the share of its words found in the other reader's lines near it, and the nearby line
+    sharing the most words.
+
+    Returns:
+        list: (found, total, best other line or None) per line
+    """
+    if not others:
+        return [(0, len(get_words(line.text)), None) for line in lines]
+    geometry = PageGeometry.from_blocks({'bbox': line.bbox} for line in others)
+    other_words = [Counter(get_words(line.text)) for line in others]
+
+    results = []
+    for line in lines:
+        words = Counter(get_words(line.text))
+        x0, top, x1, bottom = line.bbox
+        intersecting, _ = geometry.overlap_masks((x0 - tolerance, top - tolerance, x1 + tolerance, bottom + tolerance))
+        near = np.flatnonzero(intersecting).tolist()
+
+        available = Counter()
+        for i in near:
+            available.update(other_words[i])
+        found = sum((words & available).values())
+        best = max(near, key=lambda i: sum((words & other_words[i]).values()), default=None)
+        results.append((found, sum(words.values()), None if best is None else others[best]))
+    return results
+
+
+def compare_page(lines_a, lines_b, names=('pymupdf', 'pdfplumber'), tolerance=10, examples=5):
+    """
+    Align the lines two readers extracted from one page.
+
+    Args:
+        lines_a (list): LineRecords of the first reader
+        lines_b (list): LineRecords of the second reader
+        names (tuple): Reader names used as keys
+        tolerance (float): Points added around each bbox when looking for the other reader's lines
+        examples (int): Maximum number of missing lines and text diffs listed
+
+    Returns:
+        dict: Page scorecard
+    """
+    card = {'lines': {}, 'words': {}, 'word_recall': {}, 'missing_lines': {}, 'replacement_glyphs': {},
+            'text_diffs': 0, 'missing_examples': [], 'diff_examples': []}
+    for name, lines, others, other_name in ((names[0], lines_a, lines_b, names[1]),
+                                            (names[1], lines_b, lines_a, names[0])):
+        card['lines'][name] = len(lines)
+        card['replacement_glyphs'][name] = sum(count_replacement_glyphs(line.text) for line in lines)
+
+    # Words of each reader found by the other one
+    for name, lines, others, other_name in ((names[1], lines_a, lines_b, names[0]),
+                                            (names[0], lines_b, lines_a, names[1])):
+        found_total = word_total = missing = 0
+        for line, (found, total, best) in zip(lines, _find_words(lines, others, tolerance)):
+            found_total += found
+            word_total += total
+            if total and found * 2 < total:
+                missing += 1
+                if len(card['missing_examples']) < examples:
+                    card['missing_examples'].append({'missing_in': name, 'found_by': other_name, 'text': line.text,
+                                                     'bbox': list(line.bbox)})
+            elif found < total:
+                card['text_diffs'] += 1
+                if len(card['diff_examples']) < examples:
+                    card['diff_examples'].append({other_name: line.text, name: best.text if best else None,
+                                                  'bbox': list(line.bbox)})
+        card['words'][other_name] = word_total
+        card['word_recall'][name] = found_total / word_total if word_total else 1.0
+        card['missing_lines'][name] = missing
+    return card
+
+
+def compare_readers(pdf_path, tolerance=10, examples=5, **reader_kwargs):
+    """
+    Run both readers on the same pages of a document and score them against each other.
+
+    Args:
+        pdf_path (str): PDF file
+        tolerance (float): See compare_page
+        examples (int): Examples listed per page
+        **reader_kwargs: Passed to both readers, e.g. start_page, end_page, borders, _mode;
+            html_like defaults to False so formatting tags do not count as differences
+
+    Returns:
+        dict: {'document', 'pages': {page: page scorecard}, plus the totals of the document scorecard}
+    """
+    reader_kwargs.setdefault('html_like', False)
+    names = tuple(READERS)
+    runs = {name: run_reader(reader_class, pdf_path, **reader_kwargs) for name, reader_class in READERS.items()}
+
+    pages = {}
+    for page in sorted(set(runs[names[0]][0]) | set(runs[names[1]][0])):
+        card = compare_page(runs[names[0]][0].get(page, []), runs[names[1]][0].get(page, []), names, tolerance,
+                            examples)
+        card['seconds'] = {name: runs[name][1].get(page, 0.0) for name in names}
+        pages[page] = card
+
+    document = {'document': str(pdf_path), 'pages': pages, 'page_count': len(pages),
+                'seconds': {name: runs[name][2] for name in names}}
+    for key in ('lines', 'missing_lines', 'replacement_glyphs', 'words'):
+        document[key] = {name: sum(card[key][name] for card in pages.values()) for name in names}
+    document['text_diffs'] = sum(card['text_diffs'] for card in pages.values())
+    # Share of the other reader's words found, over the whole document
+    document['word_recall'] = {
+        name: (sum(card['word_recall'][name] * card['words'][other] for card in pages.values())
+               / document['words'][other] if document['words'][other] else 1.0)
+        for name, other in ((names[0], names[1]), (names[1], names[0]))}
+    return document
+
+
+def meets_bar(card, name, min_word_recall=0.99, max_missing_lines=0, max_replacement_glyphs=0):
+    """Whether a reader's scores in a page or document scorecard are within the accuracy bar."""
+    return (card['word_recall'][name] >= min_word_recall and card['missing_lines'][name] <= max_missing_lines
+            and card['replacement_glyphs'][name] <= max_replacement_glyphs)
+
+
+def choose_reader(card, **bar):
+    """
+    The fastest reader meeting the accuracy bar (see meets_bar) for a page or document scorecard.
+
+    Returns:
+        str: Reader name, or None if no reader meets the bar
+    """
+    for name in sorted(card['seconds'], key=card['seconds'].get):
+        if meets_bar(card, name, **bar):
+            return name
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdfs', nargs='+')
+    parser.add_argument('--json', help='write the full scorecards, with examples, to this file')
+    parser.add_argument('--mode', default='c', choices=['c', 'r'], help="_mode of both readers")
+    parser.add_argument('--tolerance', type=float, default=10)
+    parser.add_argument('--min-word-recall', type=float, default=0.99)
+    parser.add_argument('--max-missing-lines', type=int, default=0)
+    parser.add_argument('--max-replacement-glyphs', type=int, default=0)
+    args = parser.parse_args()
+    bar = {'min_word_recall': args.min_word_recall, 'max_missing_lines': args.max_missing_lines,
+           'max_replacement_glyphs': args.max_replacement_glyphs}
+
+    reports = []
+    for pdf in args.pdfs:
+        report = compare_readers(pdf, args.tolerance, _mode=args.mode)
+        report['choice'] = choose_reader(report, **bar)
+        for card in report['pages'].values():
+            card['choice'] = choose_reader(card, **bar)
+        reports.append(report)
+
+        print(pdf)
+        print(f"{'reader':>11} {'seconds':>8} {'pages/s':>8} {'lines':>6} {'missing':>8} {'glyphs':>7} {'recall':>7}")
+        for name in READERS:
+            seconds = report['seconds'][name]
+            print(f"{name:>11} {seconds:>8.2f} {report['page_count'] / seconds if seconds else 0:>8.1f} "
+                  f"{report['lines'][name]:>6} {report['missing_lines'][name]:>8} "
+                  f"{report['replacement_glyphs'][name]:>7} {report['word_recall'][name]:>7.2%}")
+        choices = Counter(card['choice'] for card in report['pages'].values())
+        print(f"  text diffs: {report['text_diffs']}; document reader: {report['choice']}; "
+              f"pages by reader: {dict(choices)}")
+        for page, card in report['pages'].items():
+            for example in card['missing_examples']:
+                print(f"  page {page}: missing in {example['missing_in']}: {example['text'][:80]!r}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    # Non-zero exit when a document has no reader meeting the bar
+    sys.exit(0 if all(report['choice'] for report in reports) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import json
+import sqlite3
+
+from writers import PageGroupWriter
+
+
+class LineDatabase:
+    """
+    SQLite database of extracted lines from many documents, with an FTS5 full-text index on the text.
+
+    Tables:
+        documents (id, name, reader) - one row per document, name is unique
+        lines (id, document_id, page, line_id, text, font, size, color, x0, top, x1, bottom) -
+            font, size and color are JSON lists, line_id is the line's '_id'
+        line_text - FTS5 index over lines.text (external content, diacritics ignored)
+
+    write_file(filetype='sqlite') adds each document to the database at its output path, so extracting
+    several PDFs to the same path collects them in one database, and extracting a PDF again replaces its
+    lines (see add_document). search_pages and search_lines take FTS5 queries: words, "phrases",
+    AND/OR/NOT and prefix* terms; accents are ignored. Searching matches words of single lines, so a
+    phrase broken across two lines is not found.
+
+        with LineDatabase('lines.sqlite') as db:
+            db.search_pages('autoinflamatorio')  # [('/pdfs/a.pdf', 3, 2), ...]
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            reader TEXT
+        );
+        CREATE TABLE IF NOT EXISTS lines (
+            id INTEGER PRIMARY KEY,
+            document_id INTEGER NOT NULL REFERENCES documents (id),
+            page INTEGER NOT NULL,
+            line_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            font TEXT,
+            size TEXT,
+            color TEXT,
+            x0 REAL, top REAL, x1 REAL, bottom REAL
+        );
+        CREATE INDEX IF NOT EXISTS lines_document_page ON lines (document_id, page);
+        CREATE VIRTUAL TABLE IF NOT EXISTS line_text USING fts5(
+            text, content='lines', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        );
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Database file, created if it does not exist
+        """
+        self.path = path
+        self.connection = sqlite3.connect(str(path))
+        # Safe against application crashes, and much faster to write than the default rollback journal
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        with self.connection:
+            self.connection.executescript(self.SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.connection.close()
+
+    def add_document(self, name, reader=None):
+        """
+        Register a document, removing the lines of an earlier extraction of it.
+
+        Args:
+            name (str): Unique document name, e.g. the absolute PDF path
+            reader (str): Name of the reader class that extracted it
+
+        Returns:
+            int: Document id
+        """
+        with self.connection:
+            row = self.connection.execute('SELECT id FROM documents WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                return self.connection.execute(
+                    'INSERT INTO documents (name, reader) VALUES (?, ?)', (name, reader)).lastrowid
+            document_id = row[0]
+            self.connection.execute(
+                "INSERT INTO line_text (line_text, rowid, text) SELECT 'delete', id, text FROM lines WHERE document_id = ?",
+                (document_id,))
+            self.connection.execute('DELETE FROM lines WHERE document_id = ?', (document_id,))
+            self.connection.execute('UPDATE documents SET reader = ? WHERE id = ?', (reader, document_id))
+            return document_id
+
+    def insert_lines(self, document_id, lines):
+        """
+        Insert lines and index their text, in one transaction.
+
+        Args:
+            document_id (int): Id from add_document
+            lines (list): LineRecords
+        """
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        rows = [(document_id, line.page, line._id, line.text, dumps(line.font), dumps(line.size), dumps(line.color),
+                 *line.bbox) for line in lines]
+        with self.connection:
+            last_id = self.connection.execute('SELECT coalesce(max(id), 0) FROM lines').fetchone()[0]
+            self.connection.executemany(
+                'INSERT INTO lines (document_id, page, line_id, text, font, size, color, x0, top, x1, bottom) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.connection.execute(
+                'INSERT INTO line_text (rowid, text) SELECT id, text FROM lines WHERE id > ?', (last_id,))
+
+    def search_pages(self, query):
+        """
+        Pages with lines matching a full-text query.
+
+        Args:
+            query (str): FTS5 query, e.g. 'fiebre', '"panel genético"', 'fiebre AND NOT familiar', 'gen*'
+
+        Returns:
+            list: (document name, page, number of matching lines) ordered by document and page
+        """
+        return self.connection.execute(
+            'SELECT documents.name, lines.page, count(*) FROM line_text '
+            'JOIN lines ON lines.id = line_text.rowid JOIN documents ON documents.id = lines.document_id '
+            'WHERE line_text MATCH ? GROUP BY lines.document_id, lines.page ORDER BY documents.name, lines.page',
+            (query,)).fetchall()
+
+    def search_lines(self, query, limit=100):
+        """
+        Lines matching a full-text query, best matches first.
+
+        Args:
+            query (str): FTS5 query
+            limit (int): Maximum number of lines
+
+        Returns:
+            list: Dicts with 'document', 'page', '_id', 'text' and 'bbox'
+        """
+        rows = self.connection.execute(
+            'SELECT documents.name, lines.page, lines.line_id, lines.text, lines.x0, lines.top, lines.x1, lines.bottom '
+            'FROM line_text JOIN lines ON lines.id = line_text.rowid JOIN documents ON documents.id = lines.document_id '
+            'WHERE line_text MATCH ? ORDER BY line_text.rank LIMIT ?', (query, limit))
+        return [{'document': name, 'page': page, '_id': line_id, 'text': text, 'bbox': list(bbox)}
+                for name, page, line_id, text, *bbox in rows]
+
+
+class SQLiteLineWriter(PageGroupWriter):
+    """
+    Write the LineRecords of one document to a LineDatabase.
+
+    Each group of pages (see PageGroupWriter) is inserted in one transaction.
+
+        with SQLiteLineWriter('lines.sqlite', '/pdfs/a.pdf') as writer:
+            for record in reader.iter_records():
+                writer.write(record)
+    """
+
+    def __init__(self, path, document, reader=None, rows_per_group=4096):
+        """
+        Args:
+            path (str): Database file
+            document (str): Unique document name, its earlier lines are replaced
+            reader (str): Name of the reader class
+            rows_per_group (int): Minimum number of lines per transaction, except the last one
+        """
+        super().__init__(rows_per_group)
+        self.path = path
+        self.document = document
+        self.reader = reader
+        self.database = None
+        self.document_id = None
+
+    def start(self):
+        self.database = LineDatabase(self.path)
+        self.document_id = self.database.add_document(self.document, self.reader)
+
+    def write_group(self, lines):
+        self.database.insert_lines(self.document_id, lines)
+
+    def finish(self):
+        self.database.close()
+        self.database = None
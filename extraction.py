@@ -1,21 +1,110 @@
 from abc import abstractmethod
-import json
-import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+import os
 
 import fitz
 import pdfplumber
 
+from cache import ExtractionCache
+from database import SQLiteLineWriter
+from formatting import consolidate_formatting
+from inputs import BufferReader, map_file
+from isolation import IsolatedPages
+from metrics import NULL_METRICS, StageMetrics, make_profiler, profile_summary, write_metrics
+from progress import make_progress
+from records import LineBatch, ValueInterner, pack_page_lines
+from scheduler import PageScheduler
+from styles import StyleResolver
+from writers import ArrowLineWriter, BackgroundWriter, LineEncoder, StyleTableEncoder, open_output, write_batches
+
+
+def _extract_page_chunk(open_doc, extract_page, page_nums, pack=None):
+    """
+    Worker entry point: open a private copy of the document and extract a chunk of pages.
+
+    Args:
+        open_doc: Bound reader method that opens the document
+        extract_page: Bound reader method called as extract_page(doc, page_num)
+        page_nums: Zero-based page numbers to process
+        pack: Optional function that converts each result into a cheaper form to send back
+
+    Returns:
+        tuple: (results, metrics) - (page_num, result) tuples in the order of page_nums, and the
+            worker's StageMetrics, or None if metrics are disabled
+    """
+    metrics = extract_page.__self__.metrics
+    results = []
+    with metrics.stage('open'):
+        doc = open_doc()
+    try:
+        with doc:
+            for page_num in page_nums:
+                with metrics.stage('page', page_num):
+                    result = extract_page(doc, page_num)
+                if pack is not None:
+                    result = pack(result)
+                results.append((page_num, result))
+    finally:
+        # Releases the worker's memory map with mmap_input
+        extract_page.__self__.close()
+    return results, metrics if metrics.enabled else None
+
 
 class PDFReader:
+    # Removed from font names before comparing fonts of neighbouring spans
+    font_suffix_pattern = r'\+\d+'
+    # How often the cancel token is checked while waiting for worker processes, in seconds
+    CANCEL_POLL_INTERVAL = 0.1
+
     def __init__(self, pdf_path, output_path, start_page=1, end_page=0, skip_pages=None, dehyphenate=False, html_like=True,
-                 sup_size=6, _mode='c', borders=None, x_tolerance=1.5, y_tolerance=3, is_stream=False, print_logs=True):
+                 sup_size=6, _mode='c', borders=None, x_tolerance=1.5, y_tolerance=3, is_stream=False, print_logs=True,
+                 workers=1, cache=None, report_skipped=False, mmap_input=False, metrics=False, profile=None,
+                 progress=None, progress_interval=0.1, progress_percent=None, cancel=None, page_timeout=None):
         if borders is None:
             borders = [None, None, None, None]
         if skip_pages is None:
             skip_pages = []
 
+        # With is_stream, pdf_path holds the PDF as bytes, bytearray, memoryview or mmap
         self.is_stream = is_stream
+        # Memory-map the file and open it from memory (see get_buffer)
+        self.mmap_input = mmap_input
+        self._buffer = None
         self.print_logs = print_logs
+        self.workers = max(1, int(workers or 1))
+        self.writer_stats = None
+
+        if cache is True:
+            cache = ExtractionCache()
+        elif isinstance(cache, (str, os.PathLike)):
+            cache = ExtractionCache(cache)
+        self.cache = cache or None
+        # Per-stage timings and counts (see StageMetrics), written next to the output by write_file
+        if metrics is True:
+            metrics = StageMetrics()
+        self.metrics = metrics or NULL_METRICS
+        # 'cprofile' or an object with enable() and disable(), run only while pages are extracted
+        self.profile = profile
+        self._profiler = None
+        # Default progress target when no app is given to a run (see make_progress), and how updates are coalesced
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.progress_percent = progress_percent
+        # CancelToken checked before each page, see cancellation.py
+        self.cancel = cancel
+        # Time budget of a page in seconds; pages then run in worker processes that are killed when a page
+        # runs over it (see IsolatedPages), and failed pages are recorded in failed_pages instead of stopping the run
+        self.page_timeout = page_timeout
+        # Pages (1-based) skipped in the last run, with the reason; also in the metrics file (see get_metrics)
+        self.failed_pages = {}
+        self._document_key = None
+        self._style_resolver = None
+        # Font and color tuples shared by the lines of this reader
+        self.interned_values = ValueInterner()
+        # Open documents by opener name, shared by everything done inside one `with reader:` block
+        self._documents = {}
+        self._open_depth = 0
 
         self.bold_fonts = ['Bold', '.B', '.BI']
         self.italic_fonts = ['Italic', '.I', '.BI']
@@ -25,38 +114,446 @@ class PDFReader:
         self.output_path = output_path
 
         self.start_page = start_page
-        if end_page != 0:
-            self.end_page = end_page
-        else:
-            with self._open_pdf_doc_pymupdf() as doc:
-                end_page = len(doc)
-            self.end_page = end_page
-        if self.end_page < self.start_page:
+        # 0 means the last page, counted when first needed (see end_page)
+        self._end_page = end_page
+        if end_page != 0 and end_page < start_page:
             raise ValueError("end_page cannot be greater than start_page")
 
         self.skip_pages = [page-1 for page in skip_pages]
-        self.total_pages = self.end_page - self.start_page - len(self.skip_pages) + 1
 
         self.dehyphenate = dehyphenate
         self.html_like = html_like
 
         self._mode = _mode
         self.borders = borders
+        # Extract the whole page and print the text outside the borders, instead of cropping it away
+        self.report_skipped = report_skipped
 
         self.x_tolerance = x_tolerance
         self.y_tolerance = y_tolerance
 
+    @property
+    def end_page(self):
+        """
+        Last page to extract, 1-based. If it was given as 0, the document is opened to count its pages on first use;
+        the count is kept, and outside a `with reader:` block the document is closed again.
+        """
+        if self._end_page == 0:
+            with self:
+                self._end_page = self.count_pages()
+            if self._end_page < self.start_page:
+                raise ValueError("end_page cannot be greater than start_page")
+        return self._end_page
+
+    @end_page.setter
+    def end_page(self, end_page):
+        self._end_page = end_page
+
+    @property
+    def total_pages(self):
+        return self.end_page - self.start_page - len(self.skip_pages) + 1
+
+    def count_pages(self):
+        """Number of pages in the document."""
+        return len(self.get_document(self._open_pdf_doc_pymupdf))
+
+    def __enter__(self):
+        """
+        Keep documents open until the block exits, so page counting, scheduling and every extraction
+        or output written inside it share one handle per library:
+
+            with PyMuPDFReader(pdf_path, output_path) as reader:
+                reader.write_file(filetype='jsonl')
+                reader.write_file(filetype='txt')
+        """
+        self._open_depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._open_depth -= 1
+        if self._open_depth <= 0:
+            self._open_depth = 0
+            self.close()
+        return False
+
+    def __getstate__(self):
+        # Open documents stay in this process, worker processes open their own
+        state = self.__dict__.copy()
+        state['_documents'] = {}
+        state['_open_depth'] = 0
+        state['interned_values'] = ValueInterner()
+        # Worker processes measure into their own metrics, merged back with their results
+        state['metrics'] = StageMetrics() if self.metrics.enabled else NULL_METRICS
+        state['profile'] = None
+        state['_profiler'] = None
+        state['progress'] = None
+        state['cancel'] = None
+        # Mappings are made again in each process, and share the OS page cache;
+        # memoryview and mmap input cannot be pickled, so it is sent as bytes
+        state['_buffer'] = None
+        if self.is_stream and not isinstance(self.pdf_path, (bytes, bytearray)):
+            state['pdf_path'] = bytes(self.pdf_path)
+        return state
+
+    def get_buffer(self):
+        """
+        The PDF as a memoryview both libraries open without copying it: the given bytes, bytearray,
+        memoryview or mmap if is_stream, or a read-only memory map of the file if mmap_input.
+
+        Returns:
+            memoryview or None if the libraries read the file by path
+        """
+        if self._buffer is None:
+            if self.is_stream:
+                self._buffer = memoryview(self.pdf_path).cast('B')
+            elif self.mmap_input:
+                self._buffer = map_file(self.pdf_path)
+        return self._buffer
+
+    def get_document(self, open_doc):
+        """
+        Shared open document for an opener like self._open_pdf_doc_pymupdf, opened on first use.
+
+        It stays open until the outermost `with reader:` block (or extraction run) ends, or close() is called.
+        """
+        doc = self._documents.get(open_doc.__name__)
+        if doc is None:
+            with self.metrics.stage('open'):
+                doc = self._documents[open_doc.__name__] = open_doc()
+        return doc
+
+    def close(self):
+        """Close the shared documents, and the memory map of mmap_input."""
+        documents, self._documents = self._documents, {}
+        for doc in documents.values():
+            doc.close()
+        if self._buffer is not None:
+            buffer, self._buffer = self._buffer, None
+            mapping = buffer.obj
+            buffer.release()
+            # A stream given by the caller is left open, it is only released from this reader
+            if self.mmap_input and not self.is_stream:
+                mapping.close()
+
     def _open_pdf_doc_pymupdf(self):
-        if self.is_stream:
-            return fitz.open(stream=self.pdf_path, filetype='pdf')
+        buffer = self.get_buffer()
+        if buffer is not None:
+            return fitz.open(stream=buffer, filetype='pdf')
         return fitz.open(self.pdf_path, filetype='pdf')
 
     def _open_pdf_doc_pdfplumber(self):
-        if self.is_stream:
-            import io
-            return pdfplumber.open(io.BytesIO(self.pdf_path))
+        buffer = self.get_buffer()
+        if buffer is not None:
+            pdf = pdfplumber.open(BufferReader(buffer))
+            # The reader is ours, so closing the document releases its view of the buffer
+            pdf.stream_is_external = False
+            return pdf
         return pdfplumber.open(self.pdf_path)
 
+    def get_style_resolver(self):
+        """Font and style cache shared by all pages handled by this reader (see StyleResolver)."""
+        resolver = self._style_resolver
+        if (resolver is None or resolver.bold_fonts != self.bold_fonts or resolver.italic_fonts != self.italic_fonts
+                or resolver.sup_size != self.sup_size):
+            resolver = self._style_resolver = StyleResolver(self.bold_fonts, self.italic_fonts, self.sup_size,
+                                                            self.font_suffix_pattern)
+        return resolver
+
+    def get_page_numbers(self):
+        return [page_num for page_num in range(self.start_page - 1, self.end_page) if page_num not in self.skip_pages]
+
+    def _map_pages(self, open_doc, extract_page, page_nums, doc=None, pack=None):
+        if not page_nums:
+            return
+        if self.page_timeout is not None:
+            yield from self._map_pages_isolated(open_doc, extract_page, page_nums, pack)
+            return
+        if self.workers <= 1 or len(page_nums) <= 1:
+            if doc is None:
+                doc = self.get_document(open_doc)
+            for page_num in page_nums:
+                self.check_cancelled()
+                yield page_num, self._extract_page(extract_page, doc, page_num)
+            return
+
+        scheduler = PageScheduler(self.workers)
+        costs = scheduler.estimate_costs(self.get_document(self._open_pdf_doc_pymupdf), page_nums)
+        chunks = scheduler.plan(page_nums, costs)
+
+        futures = deque()
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks))) as executor:
+            try:
+                # Chunks are contiguous and submitted in page order, a bounded window ahead of the caller;
+                # free workers take the next queued chunk
+                next_chunk = 0
+                while futures or next_chunk < len(chunks):
+                    while (next_chunk < len(chunks) and len(futures) < scheduler.max_in_flight
+                           and not self.is_cancelled()):
+                        futures.append(executor.submit(_extract_page_chunk, open_doc, extract_page, chunks[next_chunk],
+                                                       pack))
+                        next_chunk += 1
+                    # Once cancelled, only the chunks already finished are read, up to the first unfinished one
+                    if not futures or not self._wait_chunk(futures[0]):
+                        break
+                    results, metrics = futures.popleft().result()
+                    if metrics is not None:
+                        self.metrics.merge(metrics)
+                    # Pages are released as they are read, the chunk is not kept until its last page
+                    results.reverse()
+                    while results:
+                        yield results.pop()
+            finally:
+                if any(not future.done() for future in futures):
+                    # Cancelled, failed or closed early: running chunks are stopped instead of waited for
+                    self._stop_pool(executor)
+        self.check_cancelled()
+
+    def _wait_chunk(self, future):
+        """Wait for a chunk; False if the run was cancelled before it finished."""
+        while not future.done():
+            if self.is_cancelled():
+                return False
+            wait([future], timeout=self.CANCEL_POLL_INTERVAL)
+        return True
+
+    @staticmethod
+    def _stop_pool(executor):
+        """Drop the queued chunks and terminate the worker processes of a ProcessPoolExecutor."""
+        terminate_workers = getattr(executor, 'terminate_workers', None)
+        if terminate_workers is not None:
+            # Python 3.14+
+            terminate_workers()
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        # Older Pythons have no public way to stop running tasks
+        for process in list((getattr(executor, '_processes', None) or {}).values()):
+            process.terminate()
+
+    def _map_pages_isolated(self, open_doc, extract_page, page_nums, pack=None):
+        """Like _map_pages, with a time budget per page (see IsolatedPages); failed pages are not yielded."""
+        pages = IsolatedPages(open_doc, extract_page, self.workers, self.page_timeout, pack, self.cancel,
+                              self.metrics if self.metrics.enabled else None)
+        for page_num, result, reason in pages.map(page_nums):
+            if reason is not None:
+                self.failed_pages[page_num + 1] = reason
+                self.metrics.count('failed_pages', 1, page_num)
+                if self.print_logs:
+                    print(f'Skipped page {page_num + 1}: {reason}')
+                continue
+            yield page_num, result
+
+    def is_cancelled(self):
+        return self.cancel is not None and self.cancel.cancelled
+
+    def check_cancelled(self):
+        """Raise ExtractionCancelled if the reader's cancel token was cancelled."""
+        if self.cancel is not None:
+            self.cancel.raise_if_cancelled()
+
+    def _extract_page(self, extract_page, doc, page_num):
+        with self.metrics.stage('page', page_num):
+            return extract_page(doc, page_num)
+
+    def get_cache_parameters(self):
+        """Parameters that affect the extraction output, used in cache keys."""
+        return {
+            'reader': type(self).__name__,
+            '_mode': self._mode,
+            'borders': list(self.borders),
+            'report_skipped': self.report_skipped,
+            'x_tolerance': self.x_tolerance,
+            'y_tolerance': self.y_tolerance,
+            'html_like': self.html_like,
+            'sup_size': self.sup_size,
+            'dehyphenate': self.dehyphenate,
+            'bold_fonts': self.bold_fonts,
+            'italic_fonts': self.italic_fonts,
+        }
+
+    def get_raw_cache_parameters(self):
+        """Parameters that affect the raw page geometry (see get_raw_page), used in cache keys."""
+        return {'reader': type(self).__name__}
+
+    def get_document_name(self):
+        """Name of the document in outputs shared by many documents: its absolute path, or the content hash of a stream."""
+        if self.is_stream:
+            return 'sha256:' + ExtractionCache.hash_document(self.pdf_path, is_stream=True)
+        return os.path.abspath(self.pdf_path)
+
+    def _get_document_key(self):
+        if self._document_key is None:
+            self._document_key = self.cache.hash_document(self.pdf_path, self.is_stream)
+        return self._document_key
+
+    def _get_cache_keys(self, extract_page):
+        if self.cache is None:
+            return None
+        return self._get_document_key(), self.cache.hash_parameters(self.get_cache_parameters()), extract_page.__name__
+
+    def get_raw_page(self, doc, page_num, extract_raw):
+        """
+        Get the raw geometry of a page (spans, chars), the expensive part of extraction.
+
+        With a cache, raw pages are stored separately from the results, keyed only by
+        get_raw_cache_parameters(). Changing borders or tolerances then re-runs just the grouping
+        and formatting on the stored geometry instead of parsing the page again.
+
+        Args:
+            doc: Opened document
+            page_num (int): Zero-based page number
+            extract_raw: Method called as extract_raw(doc, page_num)
+
+        Returns:
+            Result of extract_raw, safe to modify
+        """
+        if self.cache is None:
+            return extract_raw(doc, page_num)
+
+        keys = (self._get_document_key(), self.cache.hash_parameters(self.get_raw_cache_parameters()),
+                'raw-' + extract_raw.__name__)
+        missing = object()
+        raw = self.cache.get(*keys, page_num, default=missing)
+        if raw is missing:
+            raw = extract_raw(doc, page_num)
+            self.cache.put(*keys, page_num, raw)
+        return raw
+
+    def _map_pages_cached(self, open_doc, extract_page, page_nums, doc=None, pack=None):
+        """Like _map_pages, but reuses page results stored in self.cache and stores new ones."""
+        cache_keys = self._get_cache_keys(extract_page)
+        if cache_keys is None:
+            yield from self._map_pages(open_doc, extract_page, page_nums, doc, pack)
+            return
+
+        cached_pages = {page_num for page_num in page_nums if self.cache.contains(*cache_keys, page_num)}
+        self.metrics.count('cached_pages', len(cached_pages))
+        results = self._map_pages(open_doc, extract_page, [p for p in page_nums if p not in cached_pages], doc, pack)
+        missing = object()
+        # Pages failed with a time budget are missing from results
+        computed = next(results, None)
+        for page_num in page_nums:
+            if page_num in cached_pages:
+                # Computed pages are checked in _map_pages
+                self.check_cancelled()
+                result = self.cache.get(*cache_keys, page_num, default=missing)
+                if result is not missing:
+                    yield page_num, result
+                    continue
+                # Evicted since the lookup
+                result = self._extract_page(extract_page, doc if doc is not None else self.get_document(open_doc),
+                                            page_num)
+            else:
+                if computed is None or computed[0] != page_num:
+                    continue
+                result = computed[1]
+                computed = next(results, None)
+            self.cache.put(*cache_keys, page_num, result)
+            yield page_num, result
+
+    def iter_pages(self, open_doc, extract_page, app=None, status='Processing page #{}', doc=None, pack=None):
+        """
+        Run a per-page extraction over the selected page range.
+
+        Pages are processed in the current process, or split across a process pool when workers > 1.
+        Pool chunks are sized by estimated page cost (see PageScheduler), each worker opens its own document.
+        With a cache, pages extracted before with the same parameters are loaded instead.
+        With page_timeout, pages run one at a time in worker processes that are killed when a page runs
+        over its budget; such pages and pages that raise are recorded in failed_pages and not yielded.
+        A cancelled run yields the pages already finished, in page order up to the first unfinished one,
+        stops the worker processes and raises ExtractionCancelled.
+        Results are always yielded in page order. Documents opened for the run are shared with the
+        rest of an enclosing `with reader:` block, or closed when the run ends.
+
+        Args:
+            open_doc: Bound method that opens the document (e.g. self._open_pdf_doc_pymupdf)
+            extract_page: Bound method called as extract_page(doc, page_num); must be picklable for workers > 1
+            app: Progress target, overrides the reader's progress (see get_progress)
+            status: Status message template, formatted with the page number
+            doc: Already opened document to use for serial runs
+            pack: Function applied to results inside worker processes before they are sent back
+
+        Yields:
+            tuple: (page_num, result)
+        """
+        progress = self.get_progress(app)
+        self.failed_pages = {}
+        with self:
+            page_nums = self.get_page_numbers()
+            total = len(page_nums)
+            progress.start(total)
+            pages = self._map_pages_cached(open_doc, extract_page, page_nums, doc, pack)
+            # The profiler only runs while pages are extracted, not while the caller handles them
+            profiler = self.get_profiler()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                for done, (page_num, result) in enumerate(pages, 1):
+                    if profiler is not None:
+                        profiler.disable()
+                    progress.update(done + len(self.failed_pages), total, status.format(page_num))
+                    yield page_num, result
+                    if profiler is not None:
+                        profiler.enable()
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                # Stops worker processes still running, e.g. when the caller stopped early or the run was cancelled
+                pages.close()
+                progress.finish()
+
+    def get_progress(self, app=None):
+        """
+        Throttled progress receiver for one run (see progress.make_progress).
+
+        Args:
+            app: A Progress, a callback(done, total, message), or the GUI application; the reader's
+                progress when None. The terminal bar is added when print_logs is set.
+        """
+        return make_progress(self.progress if app is None else app, self.print_logs, self.progress_interval,
+                             self.progress_percent)
+
+    def get_profiler(self):
+        """Profiler of the page loop for the profile option, made on first use and kept for later runs."""
+        if self._profiler is None:
+            self._profiler = make_profiler(self.profile)
+        return self._profiler
+
+    def iter_lines(self, open_doc, extract_page, app=None, status='Processing page #{}'):
+        """
+        Yield the lines of every page in page order, with document-wide '_id' numbering.
+
+        extract_page must return (lines, id_count): lines numbered from 0 within the page,
+        and how many ids the page used. Worker processes send lines back as a LineBatch,
+        which is decoded here one line at a time.
+        """
+        id_offset = 0
+        for page_num, (lines, id_count) in self.iter_pages(open_doc, extract_page, app, status,
+                                                           pack=pack_page_lines):
+            if isinstance(lines, LineBatch):
+                yield from lines.iter_lines(id_offset)
+            else:
+                for line in lines:
+                    line._id += id_offset
+                    yield line
+            id_offset += id_count
+
+    def crops_to_borders(self):
+        """
+        Whether text outside the borders is cut off before extraction, so it is never parsed.
+
+        A block or word crossing a border keeps its part inside the borders.
+        """
+        return any(self.borders) and not self.report_skipped
+
+    def reports_skipped(self):
+        """
+        Whether the whole page is extracted and text outside the borders is dropped and printed as 'Skipped:'.
+
+        Blocks or words not fully inside the borders are dropped whole (report_skipped=True, or "Report skipped
+        text" in the GUI).
+        """
+        return any(self.borders) and self.report_skipped
+
     def filter_by_coordinates(self, block):
         left = self.borders[0]
         header = self.borders[1]
@@ -64,10 +561,12 @@ class PDFReader:
         footer = self.borders[3]
         conditions = []
 
-        block_left = block.get('x0') if not 'bbox' in block else block['bbox'][0]
-        block_header = block.get('top') if not 'bbox' in block else block['bbox'][1]
-        block_right = block.get('x1') if not 'bbox' in block else block['bbox'][2]
-        block_footer = block.get('bottom') if not 'bbox' in block else block['bbox'][3]
+        # For whole pages of blocks or words, PageGeometry.border_mask does the same test at once
+        if 'bbox' in block:
+            block_left, block_header, block_right, block_footer = block['bbox'][:4]
+        else:
+            block_left, block_header, block_right, block_footer = (
+                block.get('x0'), block.get('top'), block.get('x1'), block.get('bottom'))
 
         if left:
             conditions.append(block_left >= left)
@@ -81,44 +580,126 @@ class PDFReader:
 
     @staticmethod
     def consolidate_formatting(text):
-        tags = ['b', 'i', 'sup']
-        tag_pattern = '(' + '|'.join(re.escape(tag) for tag in tags) + ')'
-        # debug = '</b></i>    <i><b>    </i></b>    <b><i>     </b></i></sup>    <sup><i><b>  |   <b><i>    </i></b>    <i><b>    </b></i>            <b><i><sup>    </sup></i></b>'
+        return consolidate_formatting(text)
 
-        previous_text = ""
-        while text != previous_text:
-            previous_text = text
+    @abstractmethod
+    def iter_records(self, app=None):
+        """Yield LineRecords page by page."""
+        pass
 
-            # 1. <tag>    </tag> -> space
-            text = re.sub(r'<' + tag_pattern + r'>(\s*?)</\1>', ' ', text)
+    def iter_json(self, app=None):
+        """Yield line dicts page by page."""
+        for record in self.iter_records(app):
+            yield record.to_dict()
 
-            # 2. </tag>   <tag> -> space
-            text = re.sub(r'</' + tag_pattern + r'>(\s*?)<\1>', ' ', text)
+    @abstractmethod
+    def iter_txt(self, app=None):
+        """Yield text lines page by page."""
+        pass
 
-            # 3. Some extra specific patterns like </i> ’ <i>
-            text = re.sub(r'</' + tag_pattern + r'>\s*(’)\s*<\1>', r'\2', text)
+    def extract_json(self, app=None):
+        return list(self.iter_json(app))
 
-        # 4 Removes one space before <tag> and one after </tag> after joining text, BUT ONLY ONCE
-        text = re.sub(rf'\s(<{tag_pattern}>)|(</{tag_pattern}>)\s', r'\1\3', text)
+    def extract_txt(self, app=None):
+        return list(self.iter_txt(app))
 
-        return text
+    def write_file(self, app=None, filetype='jsonl', queue_size=0, json_encoder='auto', compress_level=None,
+                   style_table=False):
+        """
+        Extract the document and write it to output_path.
 
-    @abstractmethod
-    def extract_json(self, app=None):
-        pass
+        Lines are written as soon as their page is extracted, so memory use is bounded by a page
+        rather than by the whole document; with workers > 1, by the chunks in flight (see
+        PageScheduler.max_in_flight). They are encoded and written in batches; output_path
+        ending with '.gz' or '.zst' is compressed on the fly (see open_output).
 
-    @abstractmethod
-    def extract_txt(self, app=None):
-        pass
+        Args:
+            app: Progress target, see get_progress
+            filetype (str): 'jsonl', 'txt', 'parquet' / 'arrow' for columnar output (needs pyarrow, see
+                ArrowLineWriter) or 'sqlite' to add the document to a searchable database (see LineDatabase);
+                queue_size, json_encoder and style_table only apply to 'jsonl' and 'txt'
+            queue_size (int): If above 0, serialize and write on a background thread, with at most
+                this many batches of lines waiting. Queue statistics are stored in self.writer_stats
+            json_encoder (str): 'orjson', 'json' or 'auto' - orjson if it is installed (see LineEncoder)
+            compress_level (int): gzip or zstd level, the library default if None
+            style_table (bool): For 'jsonl', write fonts, sizes and colors once in a document table and
+                refer to them by id from each line (see StyleTableEncoder); read the file with read_lines
+
+        With metrics enabled, stage timings and counts are written to '<output_path>.metrics.json'
+        (see get_metrics); with profile='cprofile', the profile of the page loop to '<output_path>.prof'.
+
+        If the run is cancelled (ExtractionCancelled) or fails, the lines of the pages finished so far are
+        still written before the exception is raised; so are the metrics.
+        """
+        try:
+            with self.metrics.stage('write_file'):
+                self._write_output(app, filetype, queue_size, json_encoder, compress_level, style_table)
+        finally:
+            if self.metrics.enabled or self.profile is not None:
+                output_path = str(self.output_path)
+                metrics = self.get_metrics()
+                if metrics.get('profile') is not None:
+                    self._profiler.dump_stats(output_path + '.prof')
+                    metrics['profile_path'] = output_path + '.prof'
+                write_metrics(output_path + '.metrics.json', metrics)
+
+    def get_metrics(self):
+        """
+        Stage timings and counts of the runs so far (see StageMetrics.to_dict), with the document and settings,
+        and with profile='cprofile' the functions taking the most time.
+
+        Stage 'page' is the whole extraction of a page, 'open' opening a document, 'write_file' a whole
+        write_file call and 'encode' turning lines into output (for parquet, arrow and sqlite including
+        the writes). The other stages are parts of 'page' and depend on the reader.
+        """
+        metrics = {
+            'document': self.get_document_name(),
+            'output': str(self.output_path),
+            'settings': self.get_cache_parameters(),
+            'workers': self.workers,
+        }
+        if self.failed_pages:
+            metrics['failed_pages'] = dict(self.failed_pages)
+        if self.metrics.enabled:
+            metrics.update(self.metrics.to_dict())
+        if self._profiler is not None:
+            metrics['profile'] = profile_summary(self._profiler)
+        return metrics
+
+    def _write_output(self, app, filetype, queue_size, json_encoder, compress_level, style_table):
+        if filetype in ('parquet', 'arrow', 'sqlite'):
+            if filetype == 'sqlite':
+                sink = SQLiteLineWriter(self.output_path, self.get_document_name(), type(self).__name__)
+            else:
+                sink = ArrowLineWriter(self.output_path, filetype, compress_level=compress_level)
+            with sink as writer:
+                write = self.metrics.timed('encode', writer.write)
+                for record in self.iter_records(app):
+                    write(record)
+            return
 
-    def write_file(self, app=None, filetype='jsonl'):
         if filetype == 'jsonl':
-            lines = self.extract_json(app)
-            with open(self.output_path, 'wt', encoding='utf-8') as f:
-                for item in lines:
-                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
+            # Records become dicts only when they are encoded
+            items = self.iter_records(app)
         else:
-            lines = self.extract_txt(app)
-            with open(self.output_path, 'wt', encoding='utf-8') as f:
-                for item in lines:
-                    f.write(item + '\n')
+            items = self.iter_txt(app)
+        if style_table:
+            if filetype != 'jsonl':
+                raise ValueError("style_table is only supported for 'jsonl' output")
+            encoder = StyleTableEncoder(json_encoder)
+        else:
+            encoder = LineEncoder(filetype, json_encoder)
+        encode_batch = self.metrics.timed('encode', encoder.encode_batch)
+
+        with open_output(self.output_path, compress_level) as f:
+            if queue_size > 0:
+                with BackgroundWriter(f, encode_batch, queue_size=queue_size) as writer:
+                    for item in items:
+                        writer.put(item)
+                self.writer_stats = writer.stats()
+                if self.print_logs:
+                    print('Writer: {items} lines, max queue depth {max_queue_depth}/{queue_size}, '
+                          'extraction waited {producer_stall_time:.2f}s, '
+                          'writer waited {writer_idle_time:.2f}s'.format(**self.writer_stats))
+            else:
+                write_batches(f, items, encode_batch)
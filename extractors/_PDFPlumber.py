@@ -1,95 +1,148 @@
+from bisect import bisect_left
 import re
 
-import unicodedata
-from alive_progress import alive_bar
+import numpy as np
+from pdfplumber.page import test_proposed_bbox
+from pdfplumber.utils import clip_obj, extract_words
 
 from extraction import PDFReader
+from formatting import LineBuilder, is_combining_mark
+from geometry import PageGeometry, select
+from records import LineRecord
 
 
 class PDFPlumberReader(PDFReader):
+    # Also removes subset prefixes like 'NJHPPA+'
+    font_suffix_pattern = r'^[A-Z]+\+|\+\d+'
 
-    def extract_txt(self, app=None):
-        raw_lines = self.extract_json(app)
-        lines = []
-        for line in raw_lines:
-            lines.append(line['text'])
-        return lines
+    def count_pages(self):
+        # The pdfplumber document is needed for extraction anyway, PyMuPDF is not opened just to count pages
+        return len(self.get_document(self._open_pdf_doc_pdfplumber).pages)
 
-    def extract_json(self, app=None):
-        all_lines = []
-        line_id = 0
+    def iter_txt(self, app=None):
+        for line in self.iter_records(app):
+            yield line.text
+
+    def iter_records(self, app=None):
+        all_lines = self.iter_lines(self._open_pdf_doc_pdfplumber, self.get_page_lines, app)
 
-        with alive_bar(self.total_pages, disable=not self.print_logs) as bar:
-            with self._open_pdf_doc_pdfplumber() as pdf:
-                for page_num in range(self.start_page - 1, self.end_page):
-                    if page_num in self.skip_pages:
-                        continue
-
-                    page = pdf.pages[page_num]
-                    width = page.width
-                    height = page.height
-
-                    if self._mode == 'c':
-                        for half_idx, crop_box in enumerate([
-                            (0, 0, width / 2 + 5, height),  # left half
-                            (width / 2, 0, width, height)  # right half
-                        ]):
-                            page_content = page.crop(crop_box)
-
-                            lines_by_y = self.group_lines(page_content)
-                            all_lines, line_id, page_num = self.store_lines(lines_by_y, all_lines, line_id, page_num)
-                    else:
-                        lines_by_y = self.group_lines(page)
-                        all_lines, line_id, page_num = self.store_lines(lines_by_y, all_lines, line_id, page_num)
-
-
-                    bar()
-                    if app:
-                        progress = (page_num - self.start_page + 2) / self.total_pages * 100
-                        app.root.after(0, lambda p=page_num, prog=progress: (
-                            app.status_var.set(f"Processing page #{p}"),
-                            app.progress_var.set(prog)
-                        ))
         if self.dehyphenate:
-            all_lines = self.perform_dehyphenate(all_lines)
+            all_lines = self.iter_dehyphenated(all_lines)
 
-        return all_lines
+        yield from all_lines
 
-    def group_lines(self, page_content):
-        words = page_content.extract_words(
+    def get_page_lines(self, pdf, page_num):
+        """
+        Extract the lines of one page.
+
+        Returns:
+            tuple: (lines, id_count) - lines with '_id' numbered from 0, and the number of lines
+        """
+        page_lines = []
+        line_id = 0
+        metrics = self.metrics
+
+        with metrics.stage('chars', page_num):
+            raw_page = self.get_raw_page(pdf, page_num, self.get_page_chars)
+        chars = raw_page['chars']
+        metrics.count('chars', len(chars), page_num)
+        width = raw_page['width']
+        height = raw_page['height']
+
+        geometry = None
+        if self.crops_to_borders():
+            # Text outside the borders never reaches word extraction
+            geometry = PageGeometry.from_objects(chars)
+            mask = geometry.border_mask(self.borders)
+            chars = select(chars, mask)
+            geometry = geometry.take(mask)
+
+        if self._mode == 'c':
+            if geometry is None:
+                geometry = PageGeometry.from_objects(chars)
+            for half_idx, crop_box in enumerate([
+                (0, 0, width / 2 + 5, height),  # left half
+                (width / 2, 0, width, height)  # right half
+            ]):
+                # Same as page.crop(crop_box).chars
+                test_proposed_bbox(crop_box, raw_page['bbox'])
+                half_chars = self.crop_chars(chars, geometry, crop_box)
+
+                page_lines, line_id = self._build_page_lines(half_chars, page_lines, line_id, page_num)
+        else:
+            page_lines, line_id = self._build_page_lines(chars, page_lines, line_id, page_num)
+
+        metrics.count('lines', len(page_lines), page_num)
+        return page_lines, line_id
+
+    def _build_page_lines(self, chars, page_lines, line_id, page_num):
+        metrics = self.metrics
+        with metrics.stage('extract_words', page_num):
+            words = self.extract_words(chars)
+        metrics.count('words', len(words), page_num)
+        with metrics.stage('group_lines', page_num):
+            lines_by_y = self.group_words(words)
+        with metrics.stage('build_lines', page_num):
+            page_lines, line_id, page_num = self.store_lines(lines_by_y, page_lines, line_id, page_num)
+        return page_lines, line_id
+
+    @staticmethod
+    def get_page_chars(pdf, page_num):
+        """Page size and characters, the raw geometry words are built from."""
+        page = pdf.pages[page_num]
+        return {'bbox': page.bbox, 'width': page.width, 'height': page.height, 'chars': page.chars}
+
+    def extract_words(self, chars):
+        """Same as page.extract_words(...) on a page holding these chars."""
+        return extract_words(
+            chars,
             keep_blank_chars=True,
             x_tolerance=self.x_tolerance,
             # use_text_flow=True,
             extra_attrs=['fontname', 'size', 'stroking_color', 'non_stroking_color']
         )
 
-        content_words = [w for w in words if all(self.filter_by_coordinates(w))]
-        skipped_words = [w for w in words if not all(self.filter_by_coordinates(w))]
-        if skipped_words:
-            print('Skipped: ', ' '.join([line['text'] for line in skipped_words]))
+    @staticmethod
+    def crop_chars(chars, geometry, bbox):
+        """
+        Same as pdfplumber's crop_to_bbox(chars, bbox), but chars fully inside bbox are kept as they are
+        instead of copied. Only chars crossing the bbox edge are clipped.
+
+        Args:
+            chars (list): pdfplumber chars
+            geometry (PageGeometry): Geometry of chars
+            bbox (tuple): (x0, top, x1, bottom)
+        """
+        intersecting, inside = geometry.overlap_masks(bbox)
+        inside = inside.tolist()
+        return [chars[i] if inside[i] else clip_obj(chars[i], bbox) for i in np.flatnonzero(intersecting).tolist()]
+
+    def group_lines(self, page_content):
+        chars = page_content.chars
+        if self.crops_to_borders():
+            chars = select(chars, PageGeometry.from_objects(chars).border_mask(self.borders))
+        return self.group_words(self.extract_words(chars))
+
+    def group_words(self, words):
+        """
+        Group words into lines and merge touching words of the same font.
+
+        Words are expected to be built from chars already cropped to the borders, unless skipped text is reported.
+        """
+        resolver = self.get_style_resolver()
+        if self.reports_skipped():
+            inside = PageGeometry.from_objects(words).border_mask(self.borders)
+            content_words = select(words, inside)
+            skipped_words = select(words, ~inside)
+            if skipped_words:
+                print('Skipped: ', ' '.join([line['text'] for line in skipped_words]))
+        else:
+            content_words = words
 
         if not content_words:
             return {}
 
-        y_tolerance = self.y_tolerance
-        lines_by_y = {}
-
-        # First pass: group words by y-position
-        for word in content_words:
-            # Find the closest y-position within threshold
-            y_key = None
-            for y in lines_by_y.keys():
-                if abs(word['top'] - y) <= y_tolerance:
-                    y_key = y
-                    break
-
-            if y_key is None:
-                y_key = word['top']
-                lines_by_y[y_key] = []
-
-            lines_by_y[y_key].append(word)
-
-        lines = [line[1] for line in sorted(lines_by_y.items())]
+        lines = self.cluster_by_y(content_words)
 
         # Group spans by X now
         processed_lines = []
@@ -112,10 +165,7 @@ class PDFPlumberReader(PDFReader):
                 same_size = abs(current_span["size"] - span["size"]) < 0.01
 
                 # Condition 2: # Same font name (also, making fonts like 'AdvOT863180fb+20' and 'AdvOT863180fb' the same and remove 'NJHPPA+' from 'NJHPPA+AdvOT863180fb')
-                if '+' in current_span["fontname"] or '+' in span["fontname"]:
-                    same_font = re.sub(r'^[A-Z]+\+|\+\d+', '', current_span["fontname"]) == re.sub(r'^[A-Z]+\+|\+\d+', '', span["fontname"])
-                else:
-                    same_font = current_span["fontname"] == span["fontname"]
+                same_font = resolver.get_font_id(current_span["fontname"]) == resolver.get_font_id(span["fontname"])
 
                 # Condition 3: No significant horizontal gap between spans.
                 # current_span ends at "x1", the next span starts at "x0".
@@ -139,68 +189,91 @@ class PDFPlumberReader(PDFReader):
 
         return processed_lines
 
-    def store_lines(self, lines, all_lines, line_id, page_num):
-        for line_words in lines:
-            if not line_words:
+    def cluster_by_y(self, words):
+        """
+        Group words into lines by their 'top' coordinate.
+
+        A word joins the earliest created line whose y is within y_tolerance of its top, otherwise it
+        starts a new line. Line keys are kept sorted, so only the keys next to the word's top are checked
+        (bisect) instead of every line on the page.
+
+        Returns:
+            list: Lists of words, ordered by line y
+        """
+        y_tolerance = self.y_tolerance
+        keys = []  # sorted line y positions
+        groups = []  # words of each line, same order as keys
+        created = []  # creation order of each line, same order as keys
+
+        for word in words:
+            top = word['top']
+
+            # Find the earliest created line within threshold
+            best = None
+            i = max(bisect_left(keys, top - y_tolerance) - 1, 0)
+            while i < len(keys):
+                y = keys[i]
+                if abs(top - y) <= y_tolerance:
+                    if best is None or created[i] < created[best]:
+                        best = i
+                elif y > top:
+                    break
+                i += 1
+
+            if best is not None:
+                groups[best].append(word)
+                continue
+
+            i = bisect_left(keys, top)
+            if i < len(keys) and keys[i] == top:
+                # Only possible with a negative tolerance: the line starts over
+                groups[i] = [word]
                 continue
+            keys.insert(i, top)
+            groups.insert(i, [word])
+            created.insert(i, len(created))
 
-            text_parts = []
+        return groups
+
+    def store_lines(self, lines, all_lines, line_id, page_num):
+        """
+        Build a LineRecord for each group of words and append it to all_lines.
+
+        Returns:
+            tuple: (all_lines, next line_id, page_num)
+        """
+        resolver = self.get_style_resolver()
+        interned = self.interned_values
+        lines = [line_words for line_words in lines if line_words]
+        # Bounding boxes of all lines of the page at once
+        bboxes = PageGeometry.from_objects(w for line_words in lines for w in line_words).group_bboxes(
+            [len(line_words) for line_words in lines])
+
+        for line_words, bbox in zip(lines, bboxes):
+            builder = LineBuilder()
             fonts = set()
             sizes = set()
             colors = set()
 
             for word_info in line_words:
-                fonts.add(self.clean_font_name(word_info.get('fontname', 'unknown')))
+                fonts.add(resolver.get_clean_name(word_info.get('fontname', 'unknown')))
                 sizes.add(word_info.get('size', 0))
                 colors.add(str(word_info.get('non_stroking_color', '')))
 
                 text_part = word_info['text']
 
-                # 1. Check if this "word" is just a combining accent
-                is_combining_mark = False
-                if text_part:
-                    is_combining_mark = all(unicodedata.category(c) in ('Mn', 'Mc') for c in text_part)
-
-                # 2. Apply HTML formatting
+                # HTML formatting of the word
+                style = 0
                 if self.html_like:
-                    if word_info.get('size') < self.sup_size:
-                        text_part = f'<sup>{text_part}</sup>'
-                    if any(font in word_info.get('fontname', '') for font in self.bold_fonts):
-                        text_part = f'<b>{text_part}</b>'
-                    if any(font in word_info.get('fontname', '') for font in self.italic_fonts):
-                        text_part = f'<i>{text_part}</i>'
-
-                # 3. Append intelligently
-                if is_combining_mark and text_parts:
-                    # Attach to the previous part without a space
-                    text_parts[-1] += text_part
-                else:
-                    # Add as a new part
-                    text_parts.append(text_part)
-
-            fonts = {self.clean_font_name(w.get('fontname', 'unknown')) for w in line_words}
-            sizes = {w.get('size', 0) for w in line_words}
-            colors = {str(w.get('non_stroking_color', '')) for w in line_words}
-
-            # Join the processed parts with a space
-            final_text = ' '.join(text_parts).replace('\xad', '')
-            final_text = self.consolidate_formatting(final_text)
-
-            # Calculate accurate bounding box
-            x0 = min(w['x0'] for w in line_words)
-            y0 = min(w['top'] for w in line_words)
-            x1 = max(w['x1'] for w in line_words)
-            y1 = max(w['bottom'] for w in line_words)
-
-            all_lines.append({
-                'text': final_text,
-                'font': list(fonts),
-                'size': list(sizes),
-                'color': list(colors),
-                'bbox': [x0, y0, x1, y1],
-                'page': page_num,
-                '_id': line_id
-            })
+                    style = resolver.get_style(word_info.get('fontname', ''), word_info.get('size'))
+
+                # Combining accents are attached to the previous word without a space; soft hyphens are dropped
+                builder.add(text_part.replace('\xad', ''), style, combining=is_combining_mark(text_part))
+
+            final_text = builder.build()
+
+            all_lines.append(LineRecord(final_text, interned(fonts), tuple(sizes), interned(colors), tuple(bbox),
+                                        page_num, line_id))
             line_id += 1
         return all_lines, line_id, page_num
 
@@ -211,53 +284,56 @@ class PDFPlumberReader(PDFReader):
         return font_name
 
     def perform_dehyphenate(self, all_lines):
-        if not all_lines:
-            return []
-
-        results = []
-        i = 0
+        """Dehyphenate a list of LineRecords or line dicts; returns the same kind it is given."""
+        all_lines = list(all_lines)
+        lines = list(self.iter_dehyphenated(all_lines))
+        if all_lines and isinstance(all_lines[0], dict):
+            return [line.to_dict() for line in lines]
+        return lines
 
-        while i < len(all_lines):
-            current_line = dict(all_lines[i])  # Make a copy to avoid modifying original
+    def iter_dehyphenated(self, lines):
+        """
+        Join lines ending with a hyphen to the line after them.
 
-            # Process consecutive hyphens with a forward-looking approach
-            while current_line['text'].endswith('-\n') and i + 1 < len(all_lines):
-                next_line = all_lines[i + 1]
+        Works on a stream: only the line being joined is held, so it can run on lines as they are extracted.
+        Line dicts are accepted too and converted to LineRecords.
+        """
+        current_line = None
 
+        for next_line in lines:
+            if isinstance(next_line, dict):
+                next_line = LineRecord.from_dict(next_line)
+            if current_line is not None:
+                # Process consecutive hyphens with a forward-looking approach
                 # Check if lines are in the same context or at page boundary
-                same_context = (current_line['page'] == next_line['page'])
-                page_boundary = (current_line['page'] + 1 == next_line['page'])
-
-                if not (same_context or page_boundary):
-                    break
-
-                # Get parts for merging
-                dehyphenated_text = re.sub('-\n', '', current_line['text'] + next_line['text'], count=1)
-                current_line['text'] = dehyphenated_text
-
-                # Expand bounding box to include next line
-                current_line['bbox'] = [
-                    min(current_line['bbox'][0], next_line['bbox'][0]),
-                    current_line['bbox'][1],  # Keep top of first line
-                    max(current_line['bbox'][2], next_line['bbox'][2]),
-                    next_line['bbox'][3]  # Use bottom of last line
-                ]
-
-                # Update metadata sets (fonts, sizes, colors)
-                for attr in ['font', 'size', 'color']:
-                    if attr in current_line and attr in next_line:
-                        current_set = set(current_line[attr])
-                        next_set = set(next_line[attr])
-
-                        current_line[attr] = list(current_set.union(next_set))
-
-                # Move to next line for next iteration
-                i += 1
-                if i + 1 >= len(all_lines):
-                    break
-
-            # Add the processed line to results
-            results.append(current_line)
-            i += 1
-
-        return results
+                same_context = (current_line.page == next_line.page)
+                page_boundary = (current_line.page + 1 == next_line.page)
+
+                if current_line.text.endswith('-\n') and (same_context or page_boundary):
+                    self.metrics.count('dehyphenated', 1, current_line.page)
+                    with self.metrics.stage('dehyphenate', current_line.page):
+                        # Get parts for merging
+                        dehyphenated_text = re.sub('-\n', '', current_line.text + next_line.text, count=1)
+                        current_line.text = dehyphenated_text
+
+                        # Expand bounding box to include next line
+                        current_line.bbox = (
+                            min(current_line.bbox[0], next_line.bbox[0]),
+                            current_line.bbox[1],  # Keep top of first line
+                            max(current_line.bbox[2], next_line.bbox[2]),
+                            next_line.bbox[3]  # Use bottom of last line
+                        )
+
+                        # Update metadata sets (fonts, sizes, colors)
+                        current_line.font = tuple(set(current_line.font).union(set(next_line.font)))
+                        current_line.size = tuple(set(current_line.size).union(set(next_line.size)))
+                        current_line.color = tuple(set(current_line.color).union(set(next_line.color)))
+                    continue
+
+                # Add the processed line to results
+                yield current_line
+
+            current_line = next_line.copy()  # Make a copy to avoid modifying original
+
+        if current_line is not None:
+            yield current_line
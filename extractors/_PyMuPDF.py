@@ -1,77 +1,90 @@
-import re
-
-import unicodedata
-
 import fitz
-from alive_progress import alive_bar
 
+from cancellation import ExtractionCancelled
 from extraction import PDFReader
+from formatting import LineBuilder
+from geometry import PageGeometry
+from progress import make_progress
+from records import LineRecord
 
 
 class PyMuPDFReader(PDFReader):
 
-    def extract_txt(self, app=None):
-        raw_lines = []
-        lines = []
-        flags = self.get_flags()
-        extraction_type = 'html' if self.html_like else 'text'
-
+    def iter_txt(self, app=None):
         try:
-            with self._open_pdf_doc_pymupdf() as doc:
-                if self.print_logs:
-                    print('Processing pages...')
+            if self.print_logs:
+                print('Processing pages...')
 
-                with alive_bar(self.total_pages, disable=not self.print_logs) as bar:
-                    for page_num in range(self.start_page - 1, self.end_page):
-                        if page_num in self.skip_pages:
-                            continue
+            for page_num, page_lines in self.iter_pages(self._open_pdf_doc_pymupdf, self.get_page_text, app):
+                yield from page_lines
+        except ExtractionCancelled:
+            raise
+        except Exception as e:
+            error_msg = f"Error extracting text: {str(e)}"
+            print(error_msg)
+            make_progress(self.progress if app is None else app).message(error_msg)
 
-                        page = doc.load_page(page_num)
+    def get_page_text(self, doc, page_num):
+        with self.metrics.stage('get_text', page_num):
+            lines = self._get_page_text(doc, page_num)
+        self.metrics.count('lines', len(lines), page_num)
+        return lines
 
-                        if self._mode == 'c':
-                            width2 = page.rect.width / 2
+    def _get_page_text(self, doc, page_num):
+        flags = self.get_flags()
+        extraction_type = 'html' if self.html_like else 'text'
+        raw_lines = []
 
-                            left = page.rect + (0, 0, -width2 + 5, 0)
-                            right = page.rect + (width2, 0, 0, 0)
+        page = doc.load_page(page_num)
 
-                            if any(self.borders):
-                                left = self._apply_borders_to_rect(left)
-                                right = self._apply_borders_to_rect(right)
+        if self._mode == 'c':
+            width2 = page.rect.width / 2
 
-                            raw_lines.append(page.get_text(extraction_type, clip=left, flags=flags))
-                            raw_lines.append(page.get_text(extraction_type, clip=right, flags=flags))
-                        else:
-                            rect = page.rect
-                            if any(self.borders):
-                                rect = self._apply_borders_to_rect(rect)
+            left = page.rect + (0, 0, -width2 + 5, 0)
+            right = page.rect + (width2, 0, 0, 0)
 
-                            raw_lines.append(page.get_text(extraction_type, clip=rect, flags=flags))
+            if any(self.borders):
+                left = self._apply_borders_to_rect(left)
+                right = self._apply_borders_to_rect(right)
 
-                        bar()
-                        if app:
-                            progress = (page_num - self.start_page + 2) / self.total_pages * 100
-                            app.root.after(0, lambda p=page_num, prog=progress: (
-                                app.status_var.set(f"Processing page #{p + 1}"),
-                                app.progress_var.set(prog)
-                            ))
+            if self.html_like:
+                # get_text never clips HTML output, both halves give the text of the whole page
+                text = page.get_text(extraction_type, flags=flags)
+                raw_lines.extend([text, text])
+            else:
+                raw_lines.append(page.get_text(extraction_type, clip=left, flags=flags))
+                raw_lines.append(page.get_text(extraction_type, clip=right, flags=flags))
+        else:
+            rect = page.rect
+            if any(self.borders):
+                rect = self._apply_borders_to_rect(rect)
 
-            for line in raw_lines:
-                lines.extend(line.splitlines(True))
+            raw_lines.append(page.get_text(extraction_type, clip=rect, flags=flags))
 
-            return lines
-        except Exception as e:
-            error_msg = f"Error extracting text: {str(e)}"
-            print(error_msg)
-            if app:
-                app.status_var.set(error_msg)
-            return []
-
-    def extract_json(self, app=None):
-        with self._open_pdf_doc_pymupdf() as doc:
-            blocks = self.get_blocks(doc, app)
-            lines = self.get_lines_by_blocks(blocks)
+        lines = []
+        for line in raw_lines:
+            lines.extend(line.splitlines(True))
         return lines
 
+    def iter_records(self, app=None):
+        if self.print_logs:
+            print('Processing blocks...')
+        yield from self.iter_lines(self._open_pdf_doc_pymupdf, self.get_page_lines, app,
+                                   status='Processing blocks on page #{}')
+
+    def get_page_lines(self, doc, page_num):
+        """
+        Extract the lines of one page.
+
+        Returns:
+            tuple: (lines, id_count) - lines with '_id' numbered by block from 0, and the number of blocks
+        """
+        blocks = self.get_text_blocks(doc, page_num)
+        with self.metrics.stage('build_lines', page_num):
+            lines = self.get_lines_by_blocks(blocks, page_num)
+        self.metrics.count('lines', len(lines), page_num)
+        return lines, len(blocks)
+
     def flags_decomposer(self, flags):
         """Make font flags human readable."""
         l = []
@@ -122,49 +135,104 @@ class PyMuPDFReader(PDFReader):
         return flags
 
     def get_blocks(self, doc, app=None):
-        flags = self.get_flags()
-
         if self.print_logs:
             print('Processing blocks...')
         all_blocks = []
-        with alive_bar(self.total_pages, disable=not self.print_logs) as bar:
-            for page_num in range(self.start_page - 1, self.end_page):
-                if page_num in self.skip_pages:
-                    continue
-                page = doc.load_page(page_num)
-                if self._mode == 'c':
-                    width2 = page.rect.width / 2
-                    left = page.rect + (0, 0, -width2 + 5, 0)  # the left half page
-                    right = page.rect + (width2, 0, 0, 0)  # the right half page
-                    lblocks = page.get_text("dict", clip=left, sort=True, flags=flags)["blocks"]
-                    rblocks = page.get_text("dict", clip=right, sort=True, flags=flags)["blocks"]
-                    blocks = lblocks + rblocks
-                else:
-                    blocks = page.get_text("dict", sort=True, flags=flags)["blocks"]
-
-                blocks = self._preprocess_blocks(blocks)
-
-                for block in blocks:
-                    if block['type'] != 0:
-                        continue
-                    if not all(self.filter_by_coordinates(block)):
-                        print('Skipped: ', ' '.join([span['text'] for line in block['lines'] for span in line['spans']]))
-                        continue
-                    all_blocks.append(block | {'page': page_num})
-                bar()
-                if app:
-                    progress = (page_num - self.start_page + 2) / self.total_pages * 100
-                    app.root.after(0, lambda p=page_num, prog=progress: (
-                        app.status_var.set(f"Processing blocks on page #{p}"),
-                        app.progress_var.set(prog)
-                    ))
+        for page_num, blocks in self.iter_pages(self._open_pdf_doc_pymupdf, self.get_page_blocks, app,
+                                                status='Processing blocks on page #{}', doc=doc):
+            all_blocks.extend(blocks)
         return all_blocks
 
-    def get_lines_by_blocks(self, blocks):
+    def get_raw_cache_parameters(self):
+        """
+        Parameters of get_page_dict in cache keys.
+
+        The borders are part of them when they are applied as a clip, so changing the borders re-parses every page
+        instead of reusing the cached pages, unless skipped text is reported.
+        """
+        clip = list(self.borders) if self.crops_to_borders() else None
+        return super().get_raw_cache_parameters() | {'_mode': self._mode, 'flags': self.get_flags(), 'clip': clip}
+
+    def get_page_dict(self, doc, page_num):
+        """
+        Text blocks of a page as returned by get_text("dict"), for both halves in column mode.
+
+        Each half is extracted on its own: MuPDF clips a line crossing the middle character by character,
+        which splitting the blocks of the whole page by x would not reproduce.
+
+        Unless skipped text is reported, the borders are applied as a clip, so text outside them is not extracted.
+        """
+        flags = self.get_flags()
+        crop = self.crops_to_borders()
+
+        page = doc.load_page(page_num)
+        if self._mode == 'c':
+            width2 = page.rect.width / 2
+            left = page.rect + (0, 0, -width2 + 5, 0)  # the left half page
+            right = page.rect + (width2, 0, 0, 0)  # the right half page
+            clips = [left, right]
+            if crop:
+                clips = [clip for clip in map(self._apply_borders_to_rect, clips) if clip is not None]
+
+            blocks = []
+            for clip in clips:
+                blocks += page.get_text("dict", clip=clip, sort=True, flags=flags)["blocks"]
+        elif crop:
+            clip = self._apply_borders_to_rect(page.rect)
+            if clip is None:
+                return []
+            blocks = page.get_text("dict", clip=clip, sort=True, flags=flags)["blocks"]
+        else:
+            blocks = page.get_text("dict", sort=True, flags=flags)["blocks"]
+
+        return [block for block in blocks if block['type'] == 0]
+
+    def get_page_blocks(self, doc, page_num):
+        """Text blocks of a page, each with its 'page' number."""
+        return [block | {'page': page_num} for block in self.get_text_blocks(doc, page_num)]
+
+    def get_text_blocks(self, doc, page_num):
+        """Text blocks of a page with lines and spans merged, without the blocks skipped by the borders."""
+        page_blocks = []
+        metrics = self.metrics
+
+        with metrics.stage('get_text', page_num):
+            blocks = self.get_raw_page(doc, page_num, self.get_page_dict)
+        if metrics.enabled:
+            metrics.count('blocks', len(blocks), page_num)
+            metrics.count('spans', sum(len(line['spans']) for block in blocks for line in block['lines']), page_num)
+        with metrics.stage('preprocess_blocks', page_num):
+            blocks = self._preprocess_blocks(blocks)
+        report_skipped = self.reports_skipped()
+        if report_skipped:
+            inside = PageGeometry.from_blocks(blocks).border_mask(self.borders).tolist()
+
+        for i, block in enumerate(blocks):
+            if block['type'] != 0:
+                continue
+            if report_skipped and not inside[i]:
+                print('Skipped: ', ' '.join([span['text'] for line in block['lines'] for span in line['spans']]))
+                continue
+            page_blocks.append(block)
+        return page_blocks
+
+    def get_lines_by_blocks(self, blocks, page_num=None):
+        """
+        Build the output lines of text blocks.
+
+        Args:
+            blocks (list): Text blocks
+            page_num (int): Page of the blocks, read from each block's 'page' if None
+
+        Returns:
+            list: LineRecords, '_id' is the index of the block
+        """
+        resolver = self.get_style_resolver()
+        interned = self.interned_values
         lines = []
         for i, block in enumerate(blocks):
             for line in block['lines']:
-                line_parts = []
+                builder = LineBuilder()
                 font_set = set()
                 size_set = set()
                 color_set = set()
@@ -174,37 +242,17 @@ class PyMuPDFReader(PDFReader):
                     size_set.add(span['size'])
                     color_set.add(str(span['color']))
 
-                    word = span['text']
+                    # HTML-like formatting of the span
+                    style = 0
+                    if self.html_like:
+                        style = resolver.get_style(span['font'], span['size'], span['flags'])
 
-                    # 1. Determine if the current span is just a combining character.
-                    # 'Mn' = Non-Spacing Mark, 'Mc' = Spacing Combining Mark
-                    is_combining_mark = False
-                    if word:  # Ensure the string is not empty
-                        is_combining_mark = all(unicodedata.category(c) in ('Mn', 'Mc') for c in word)
+                    # Spaces between spans, combining marks attached to the previous span, merged tags
+                    builder.add(span['text'], style)
 
-                    # 2. Apply HTML-like formatting to the word
-                    word_flags = self.flags_decomposer(span['flags'])
-                    if self.html_like:
-                        if span['size'] < self.sup_size:
-                            word = f'<sup>{word}</sup>'
-                        if any(font in span['font'] for font in self.bold_fonts) or 'bold' in word_flags:
-                            word = f'<b>{word}</b>'
-                        if any(font in span['font'] for font in self.italic_fonts) or 'italic' in word_flags:
-                            word = f'<i>{word}</i>'
-
-                    # 3. Append intelligently
-                    if is_combining_mark and line_parts:
-                        # If it's a combining mark, attach it to the previous part
-                        line_parts[-1] += word
-                    else:
-                        # Otherwise, add it as a new part (will be joined by spaces later)
-                        line_parts.append(word)
-
-                # Join the parts with spaces
-                span_text = ' '.join(line_parts)
-                span_text = self.consolidate_formatting(span_text)
-                lines.append({'text': span_text, 'font': list(font_set), 'size': list(size_set), 'color': list(color_set),
-                              'bbox': block['bbox'], 'page': block['page'], '_id': i})
+                span_text = builder.build()
+                lines.append(LineRecord(span_text, interned(font_set), tuple(size_set), interned(color_set), block['bbox'],
+                                        block['page'] if page_num is None else page_num, i))
         return lines
 
     def _apply_borders_to_rect(self, rect):
@@ -239,6 +287,7 @@ class PyMuPDFReader(PDFReader):
         return modified_rect
 
     def _preprocess_blocks(self, blocks):
+        resolver = self.get_style_resolver()
 
         # Merge when separate words of same line are in separate lines
         for block in blocks:
@@ -290,10 +339,7 @@ class PyMuPDFReader(PDFReader):
                             # 2. Same font name (also, make fonts like 'AdvOT863180fb+20' and 'AdvOT863180fb' the same)
                             # 3. No space between them (check x-coordinates)
                             same_size = abs(current_span["size"] - span["size"]) < 0.01
-                            if '+' in current_span["font"] or '+' in span["font"]:
-                                same_font = re.sub(r'\+\d+|', '', current_span["font"]) == re.sub(r'\+\d+', '', span["font"])
-                            else:
-                                same_font = current_span["font"] == span["font"]
+                            same_font = resolver.get_font_id(current_span["font"]) == resolver.get_font_id(span["font"])
 
                             # Check if there's a gap between spans
                             # current_span ends at bbox[2], span starts at bbox[0]
@@ -0,0 +1,164 @@
+import re
+import unicodedata
+
+
+# Style bits of a run of text
+BOLD = 1
+ITALIC = 2
+SUP = 4
+
+# Tags from the outermost to the innermost, the order words are wrapped in: <i><b><sup>word</sup></b></i>
+_TAGS = ((ITALIC, 'i'), (BOLD, 'b'), (SUP, 'sup'))
+_TAG_LISTS = tuple(tuple(tag for bit, tag in _TAGS if style & bit) for style in range(8))
+_OPEN = {tag: f'<{tag}>' for bit, tag in _TAGS}
+_CLOSE = {tag: f'</{tag}>' for bit, tag in _TAGS}
+
+
+def consolidate_formatting(text):
+    tags = ['b', 'i', 'sup']
+    tag_pattern = '(' + '|'.join(re.escape(tag) for tag in tags) + ')'
+    # debug = '</b></i>    <i><b>    </i></b>    <b><i>     </b></i></sup>    <sup><i><b>  |   <b><i>    </i></b>    <i><b>    </b></i>            <b><i><sup>    </sup></i></b>'
+
+    previous_text = ""
+    while text != previous_text:
+        previous_text = text
+
+        # 1. <tag>    </tag> -> space
+        text = re.sub(r'<' + tag_pattern + r'>(\s*?)</\1>', ' ', text)
+
+        # 2. </tag>   <tag> -> space
+        text = re.sub(r'</' + tag_pattern + r'>(\s*?)<\1>', ' ', text)
+
+        # 3. Some extra specific patterns like </i> ’ <i>
+        text = re.sub(r'</' + tag_pattern + r'>\s*(’)\s*<\1>', r'\2', text)
+
+    # 4 Removes one space before <tag> and one after </tag> after joining text, BUT ONLY ONCE
+    text = re.sub(rf'\s(<{tag_pattern}>)|(</{tag_pattern}>)\s', r'\1\3', text)
+
+    return text
+
+
+def is_combining_mark(text):
+    """Whether text is made only of combining characters ('Mn' - Non-Spacing Mark, 'Mc' - Spacing Combining Mark)."""
+    # No combining marks below U+0300, which skips unicodedata for almost every span
+    if not text or text[0] < '\u0300':
+        return False
+    return all(unicodedata.category(c) in ('Mn', 'Mc') for c in text)
+
+
+def wrap_tags(text, style):
+    """Wrap text in <sup>, <b> and <i> tags, in the same order as the readers always did."""
+    for tag in reversed(_TAG_LISTS[style]):
+        text = f'{_OPEN[tag]}{text}{_CLOSE[tag]}'
+    return text
+
+
+class LineBuilder:
+    """
+    Assemble the text of one output line from styled runs (spans or words).
+
+    Runs are joined with spaces, combining marks are attached to the previous run, and the
+    <i>, <b>, <sup> tags are emitted already merged. The result is the same as wrapping every run in
+    its own tags and passing the joined text through consolidate_formatting, but it is
+    built in one pass. Lines the single pass does not cover (runs that are blank, a lone '’' or contain
+    '<') go through consolidate_formatting.
+    """
+
+    __slots__ = ('texts', 'styles', 'attached')
+
+    def __init__(self):
+        self.texts = []
+        self.styles = []
+        self.attached = []
+
+    def add(self, text, style=0, combining=None):
+        """
+        Add a run of text.
+
+        Args:
+            text (str): Run text
+            style (int): BOLD | ITALIC | SUP bits, 0 for plain text
+            combining (bool): Whether text is a combining mark; detected if None
+        """
+        if combining is None:
+            combining = is_combining_mark(text)
+        self.attached.append(combining and bool(self.texts))
+        self.texts.append(text)
+        self.styles.append(style)
+
+    def build_legacy(self):
+        """Wrap every run in its own tags and join them, the input consolidate_formatting expects."""
+        parts = []
+        for text, style, attached in zip(self.texts, self.styles, self.attached):
+            text = wrap_tags(text, style)
+            if attached:
+                parts[-1] += text
+            else:
+                parts.append(text)
+        return ' '.join(parts)
+
+    def build(self):
+        texts = self.texts
+        if not texts:
+            return ''
+
+        has_tags = any(self.styles)
+        if any('<' in text for text in texts):
+            return consolidate_formatting(self.build_legacy())
+
+        if not has_tags:
+            parts = []
+            for text, attached in zip(texts, self.attached):
+                if attached:
+                    parts[-1] += text
+                else:
+                    parts.append(text)
+            return ' '.join(parts)
+
+        # Blank runs and lone apostrophes are collapsed by consolidate_formatting in ways that depend on
+        # the order of its passes
+        if any(not text or text.isspace() or text.strip() == '’' for text in texts):
+            return consolidate_formatting(self.build_legacy())
+
+        out = []
+        buffer = []
+        last_tag_closes = None
+
+        def emit_tag(tag_text, closing):
+            # Tags around the text are final, so drop one space after a closing tag and one before
+            # an opening tag, as consolidate_formatting does once at the end
+            nonlocal buffer, last_tag_closes
+            text = ''.join(buffer)
+            start = 1 if last_tag_closes and text[:1].isspace() else 0
+            end = len(text)
+            if not closing and end > start and text[end - 1].isspace():
+                end -= 1
+            out.append(text[start:end])
+            out.append(tag_text)
+            buffer = []
+            last_tag_closes = closing
+
+        current = ()
+        for i, (text, style) in enumerate(zip(texts, self.styles)):
+            tags = _TAG_LISTS[style]
+            if i:
+                # Tags shared from the outside by both runs stay open and the runs are joined by a space
+                shared = 0
+                while shared < len(current) and shared < len(tags) and current[shared] == tags[shared]:
+                    shared += 1
+                for tag in reversed(current[shared:]):
+                    emit_tag(_CLOSE[tag], True)
+                buffer.append(' ' if shared or not self.attached[i] else '')
+                for tag in tags[shared:]:
+                    emit_tag(_OPEN[tag], False)
+            else:
+                for tag in tags:
+                    emit_tag(_OPEN[tag], False)
+            buffer.append(text)
+            current = tags
+
+        for tag in reversed(current):
+            emit_tag(_CLOSE[tag], True)
+        text = ''.join(buffer)
+        out.append(text[1:] if last_tag_closes and text[:1].isspace() else text)
+        return ''.join(out)
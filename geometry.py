@@ -0,0 +1,113 @@
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+
+
+_bbox_getter = itemgetter('x0', 'top', 'x1', 'bottom')
+
+
+def select(objects, mask):
+    """Objects where the boolean mask is set."""
+    return [objects[i] for i in np.flatnonzero(mask).tolist()]
+
+
+class PageGeometry:
+    """
+    Bounding boxes of the chars, words or blocks of a page, stored column by column.
+
+    x0, top, x1 and bottom are float arrays, so border masks, column assignment and line bboxes
+    are computed for the whole page at once instead of object by object.
+    """
+
+    __slots__ = ('x0', 'top', 'x1', 'bottom')
+
+    def __init__(self, coordinates):
+        """
+        Args:
+            coordinates: Array of shape (n, 4) with x0, top, x1, bottom of each object
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 4)
+        self.x0, self.top, self.x1, self.bottom = coordinates.T
+
+    @classmethod
+    def from_objects(cls, objects):
+        """From pdfplumber objects (dicts with 'x0', 'top', 'x1', 'bottom')."""
+        return cls(np.fromiter(chain.from_iterable(map(_bbox_getter, objects)), dtype=np.float64))
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """From PyMuPDF blocks, lines or spans (dicts with 'bbox')."""
+        return cls([block['bbox'] for block in blocks])
+
+    def __len__(self):
+        return len(self.x0)
+
+    def take(self, mask):
+        """Geometry of the objects where the boolean mask is set."""
+        return PageGeometry(np.column_stack((self.x0[mask], self.top[mask], self.x1[mask], self.bottom[mask])))
+
+    def border_mask(self, borders):
+        """
+        Which objects are inside the borders, same test as PDFReader.filter_by_coordinates.
+
+        Args:
+            borders (list): [left, header, right, footer], unset borders are None or 0
+
+        Returns:
+            numpy.ndarray: Boolean mask
+        """
+        left, header, right, footer = borders
+        mask = np.ones(len(self), dtype=bool)
+        if left:
+            mask &= self.x0 >= left
+        if header:
+            mask &= self.top >= header
+        if right:
+            mask &= self.x1 <= right
+        if footer:
+            mask &= self.bottom <= footer
+        return mask
+
+    def overlap_masks(self, bbox):
+        """
+        Which objects intersect bbox and which lie fully inside it, same test as pdfplumber's crop.
+
+        Args:
+            bbox (tuple): (x0, top, x1, bottom)
+
+        Returns:
+            tuple: (intersecting, inside) boolean masks
+        """
+        bx0, btop, bx1, bbottom = bbox
+        o_x0 = np.maximum(self.x0, bx0)
+        o_top = np.maximum(self.top, btop)
+        o_x1 = np.minimum(self.x1, bx1)
+        o_bottom = np.minimum(self.bottom, bbottom)
+        o_width = o_x1 - o_x0
+        o_height = o_bottom - o_top
+
+        intersecting = (o_height >= 0) & (o_width >= 0) & (o_height + o_width > 0)
+        inside = intersecting & (o_x0 == self.x0) & (o_top == self.top) & (o_x1 == self.x1) & (o_bottom == self.bottom)
+        return intersecting, inside
+
+    def group_bboxes(self, lengths):
+        """
+        Bounding box of each group of consecutive objects, e.g. the words of each line.
+
+        Args:
+            lengths (list): Number of objects in each group, all above 0
+
+        Returns:
+            list: [x0, top, x1, bottom] of each group
+        """
+        if not lengths:
+            return []
+        starts = np.zeros(len(lengths), dtype=np.intp)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        return np.column_stack((
+            np.minimum.reduceat(self.x0, starts),
+            np.minimum.reduceat(self.top, starts),
+            np.maximum.reduceat(self.x1, starts),
+            np.maximum.reduceat(self.bottom, starts),
+        )).tolist()
@@ -0,0 +1,80 @@
+"""
+Zero-copy PDF inputs of the readers.
+
+With mmap_input=True a reader memory-maps the PDF file (map_file) and opens it from memory without
+copying it; worker processes map the same file and share the OS page cache. With is_stream=True,
+pdf_path can be bytes, bytearray, memoryview or mmap, opened without a copy through BufferReader
+(worker processes still receive a copy). The mapping is released when the reader is closed.
+"""
+import io
+import mmap
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only, seekable file over a buffer (bytes, bytearray, memoryview or mmap).
+
+    The buffer is not copied; every reader keeps its own position, so several documents
+    can be opened over one buffer at the same time.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"negative seek position {position}")
+        self._position = position
+        return position
+
+    def readinto(self, b):
+        data = self._view[self._position:self._position + len(b)]
+        b[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def read(self, size=-1):
+        start = self._position
+        end = len(self._view) if size is None or size < 0 else min(start + size, len(self._view))
+        self._position = max(start, end)
+        return self._view[start:end].tobytes()
+
+    def readall(self):
+        return self.read()
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+def map_file(path):
+    """
+    Memory-map a file read-only.
+
+    Pages of the file are loaded by the OS on access and shared by every process that maps the same file.
+
+    Returns:
+        memoryview: Byte view over the mapping
+    """
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapping)
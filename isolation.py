@@ -0,0 +1,185 @@
+from collections import deque
+import multiprocessing
+from multiprocessing.connection import wait
+import time
+
+from metrics import StageMetrics
+
+
+def _page_worker(connection, open_doc, extract_page, pack=None):
+    """
+    Worker process entry point: open a private copy of the document, then extract the pages sent
+    through the connection one at a time until None is received.
+
+    Each page is answered with ('ok', page_num, result, metrics) or ('error', page_num, reason, metrics);
+    metrics are the StageMetrics of that page only, or None if metrics are disabled.
+    """
+    reader = extract_page.__self__
+    doc = None
+    try:
+        while True:
+            page_num = connection.recv()
+            if page_num is None:
+                break
+            try:
+                if doc is None:
+                    with reader.metrics.stage('open'):
+                        doc = open_doc()
+                with reader.metrics.stage('page', page_num):
+                    result = extract_page(doc, page_num)
+                if pack is not None:
+                    result = pack(result)
+                message = ('ok', page_num, result)
+            except Exception as e:
+                message = ('error', page_num, f'{type(e).__name__}: {e}')
+            metrics = reader.metrics if reader.metrics.enabled else None
+            connection.send(message + (metrics,))
+            if metrics is not None:
+                reader.metrics = StageMetrics()
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if doc is not None:
+            doc.close()
+
+
+class _Worker:
+    __slots__ = ('process', 'connection', 'page_num', 'deadline')
+
+    def __init__(self, context, open_doc, extract_page, pack):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_page_worker, args=(child_connection, open_doc, extract_page, pack),
+                                       daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.page_num = None
+        self.deadline = None
+
+    def submit(self, page_num, timeout):
+        self.page_num = page_num
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.connection.send(page_num)
+
+    def stop(self, kill=False):
+        if not kill:
+            try:
+                self.connection.send(None)
+            except OSError:
+                kill = True
+            else:
+                self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class IsolatedPages:
+    """
+    Extract pages in worker processes that can be killed, one page at a time, so a page that hangs
+    or crashes its process only loses that page.
+
+    A page running longer than its time budget is killed with its worker, which is replaced by a new
+    one for the next pages. Pages that time out, raise or kill their worker are reported as failed
+    with a reason instead of stopping the run. Unlike the chunked pool of PDFReader._map_pages, each
+    page is a separate round trip, so only use it when a time budget is needed.
+    """
+
+    # How often the cancel token is checked while waiting for workers, in seconds
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, open_doc, extract_page, workers=1, timeout=None, pack=None, cancel=None, metrics=None):
+        """
+        Args:
+            open_doc: Bound reader method that opens the document
+            extract_page: Bound reader method called as extract_page(doc, page_num); must be picklable
+            workers (int): Number of worker processes
+            timeout (float): Time budget of a page in seconds, None for no limit
+            pack: Optional function applied to results inside the workers
+            cancel (CancelToken): Stops the run at the next page, raising ExtractionCancelled
+            metrics (StageMetrics): Receives the measurements of the workers
+        """
+        self.open_doc = open_doc
+        self.extract_page = extract_page
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.pack = pack
+        self.cancel = cancel
+        self.metrics = metrics
+        self._context = multiprocessing.get_context()
+
+    def map(self, page_nums):
+        """
+        Yields:
+            tuple: (page_num, result, reason) in page order; result is None and reason says why
+                for failed pages, reason is None otherwise
+        """
+        page_nums = list(page_nums)
+        queue = deque(page_nums)
+        done = {}
+        next_index = 0
+        workers = []
+        try:
+            while next_index < len(page_nums):
+                if self.cancel is not None:
+                    self.cancel.raise_if_cancelled()
+
+                # Keep every worker busy with the next pages
+                for worker in workers:
+                    if worker.page_num is None and queue:
+                        worker.submit(queue.popleft(), self.timeout)
+                while queue and len(workers) < self.workers:
+                    worker = _Worker(self._context, self.open_doc, self.extract_page, self.pack)
+                    worker.submit(queue.popleft(), self.timeout)
+                    workers.append(worker)
+
+                busy = [worker for worker in workers if worker.page_num is not None]
+                now = time.monotonic()
+                wait_time = self.POLL_INTERVAL
+                deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+                if deadlines:
+                    wait_time = max(0.0, min(wait_time, min(deadlines) - now))
+                ready = wait([worker.connection for worker in busy] + [worker.process.sentinel for worker in busy],
+                             wait_time)
+
+                for worker in busy:
+                    page_num = worker.page_num
+                    if worker.connection in ready or worker.connection.poll():
+                        try:
+                            status, page_num, value, metrics = worker.connection.recv()
+                        except (EOFError, OSError):
+                            done[page_num] = (None, self._exit_reason(worker))
+                            self._replace(workers, worker)
+                            continue
+                        if metrics is not None and self.metrics is not None:
+                            self.metrics.merge(metrics)
+                        done[page_num] = (value, None) if status == 'ok' else (None, value)
+                        worker.page_num = worker.deadline = None
+                    elif not worker.process.is_alive():
+                        done[page_num] = (None, self._exit_reason(worker))
+                        self._replace(workers, worker)
+                    elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                        done[page_num] = (None, f'timed out after {self.timeout:g}s')
+                        self._replace(workers, worker)
+
+                # Results are yielded in page order
+                while next_index < len(page_nums) and page_nums[next_index] in done:
+                    page_num = page_nums[next_index]
+                    result, reason = done.pop(page_num)
+                    next_index += 1
+                    yield page_num, result, reason
+        finally:
+            for worker in workers:
+                # Workers still running a page are killed, e.g. when the run is cancelled
+                worker.stop(kill=worker.page_num is not None)
+
+    @staticmethod
+    def _exit_reason(worker):
+        worker.process.join(1)
+        return f'worker process exited with code {worker.process.exitcode}'
+
+    @staticmethod
+    def _replace(workers, worker):
+        # A new worker is started for the next page
+        workers.remove(worker)
+        worker.stop(kill=True)
@@ -3,6 +3,7 @@ import threading
 import tkinter as tk
 from tkinter import ttk
 
+from cancellation import CancelToken, ExtractionCancelled
 from extractors import PDFPlumberReader
 from extractors import PyMuPDFReader
 from ui import PDFReaderGUI
@@ -19,6 +20,8 @@ def main():
     app = PDFReaderGUI(root)
 
     params = None
+    # Token of the running extraction, None when idle
+    running = {'cancel': None}
 
     def on_extract():
         params = app._execute_extraction()
@@ -27,10 +30,11 @@ def main():
             return
         reader_type = params.pop('reader_type')
         extract_filetype = params.pop('extract_filetype')
+        cancel = CancelToken()
         if reader_type == 'pymupdf':
-            reader = PyMuPDFReader(**params)
+            reader = PyMuPDFReader(**params, cancel=cancel)
         else:
-            reader = PDFPlumberReader(**params)
+            reader = PDFPlumberReader(**params, cancel=cancel)
 
         def run_extraction():
             try:
@@ -39,17 +43,28 @@ def main():
                 app.root.after(0, lambda: app.status_var.set(
                     f"Extraction complete.\nOutput saved to {reader.output_path}"))
                 app.root.after(0, lambda: print(f"Extraction complete. \nOutput saved to {reader.output_path}"))
+            except ExtractionCancelled:
+                app.root.after(0, lambda: app.status_var.set(
+                    f"Extraction cancelled.\nPages done so far saved to {reader.output_path}"))
             except Exception as e:
                 app.root.after(0, lambda: app.status_var.set(f"Error: {str(e)}"))
                 app.root.after(0, lambda: print(f"Error: {str(e)}"))
+            finally:
+                running['cancel'] = None
 
         # Start the thread
+        running['cancel'] = cancel
         extraction_thread = threading.Thread(target=run_extraction)
         extraction_thread.daemon = True  # Thread will exit when main program exits
         extraction_thread.start()
 
     def on_cancel():
-        root.quit()
+        # Stop the running extraction at the next page, quit when idle
+        if running['cancel'] is not None:
+            running['cancel'].cancel('Cancelled by user')
+            app.status_var.set("Cancelling...")
+        else:
+            root.quit()
 
     for widget in app.scrollable_frame.winfo_children():
         if isinstance(widget, ttk.Frame):
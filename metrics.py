@@ -0,0 +1,185 @@
+import cProfile
+import json
+import pstats
+import time
+
+
+class StageMetrics:
+    """
+    Wall and CPU time of extraction stages, in total and per page, and counts of spans, words and lines.
+
+    Stages nest: 'page' holds the whole extraction of a page, and stages like 'get_text' or 'build_lines'
+    are parts of it. CPU time is the time of the thread running the stage.
+
+        metrics = StageMetrics()
+        with metrics.stage('get_text', page_num):
+            ...
+        metrics.count('spans', span_count, page_num)
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}  # name: [calls, wall, cpu]
+        self.counts = {}
+        self.pages = {}  # page: {'stages': {name: [wall, cpu]}, 'counts': {name: count}}
+
+    def stage(self, name, page=None):
+        """Context manager timing one run of a stage, of a page if given."""
+        return _Stage(self, name, page)
+
+    def add_time(self, name, wall, cpu, page=None, calls=1):
+        total = self.stages.get(name)
+        if total is None:
+            total = self.stages[name] = [0, 0.0, 0.0]
+        total[0] += calls
+        total[1] += wall
+        total[2] += cpu
+        if page is not None:
+            page_stages = self._get_page(page)['stages']
+            page_total = page_stages.get(name)
+            if page_total is None:
+                page_total = page_stages[name] = [0.0, 0.0]
+            page_total[0] += wall
+            page_total[1] += cpu
+
+    def count(self, name, count, page=None):
+        self.counts[name] = self.counts.get(name, 0) + count
+        if page is not None:
+            page_counts = self._get_page(page)['counts']
+            page_counts[name] = page_counts.get(name, 0) + count
+
+    def _get_page(self, page):
+        entry = self.pages.get(page)
+        if entry is None:
+            entry = self.pages[page] = {'stages': {}, 'counts': {}}
+        return entry
+
+    def timed(self, name, function):
+        """Wrap a function so every call is timed as a stage."""
+        def timed_function(*args, **kwargs):
+            with self.stage(name):
+                return function(*args, **kwargs)
+        return timed_function
+
+    def merge(self, other):
+        """Add the measurements of another StageMetrics, e.g. one filled in a worker process."""
+        for name, (calls, wall, cpu) in other.stages.items():
+            self.add_time(name, wall, cpu, calls=calls)
+        for name, count in other.counts.items():
+            self.count(name, count)
+        for page, entry in other.pages.items():
+            page_entry = self._get_page(page)
+            for name, (wall, cpu) in entry['stages'].items():
+                page_total = page_entry['stages'].setdefault(name, [0.0, 0.0])
+                page_total[0] += wall
+                page_total[1] += cpu
+            for name, count in entry['counts'].items():
+                page_entry['counts'][name] = page_entry['counts'].get(name, 0) + count
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: {'stages': {name: {'calls', 'wall', 'cpu'}}, 'counts': {name: count},
+                'pages': {page: {'stages': {name: {'wall', 'cpu'}}, 'counts': {name: count}}}}
+        """
+        return {
+            'stages': {name: {'calls': calls, 'wall': wall, 'cpu': cpu}
+                       for name, (calls, wall, cpu) in self.stages.items()},
+            'counts': dict(self.counts),
+            'pages': {page: {'stages': {name: {'wall': wall, 'cpu': cpu} for name, (wall, cpu) in entry['stages'].items()},
+                             'counts': dict(entry['counts'])}
+                      for page, entry in sorted(self.pages.items())},
+        }
+
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'page', 'wall', 'cpu')
+
+    def __init__(self, metrics, name, page):
+        self.metrics = metrics
+        self.name = name
+        self.page = page
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.metrics.add_time(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu, self.page)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class NullMetrics:
+    """Metrics that record nothing, used when metrics are disabled; every call is a no-op."""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name, page=None):
+        return self._stage
+
+    def add_time(self, name, wall, cpu, page=None, calls=1):
+        pass
+
+    def count(self, name, count, page=None):
+        pass
+
+    def timed(self, name, function):
+        return function
+
+    def merge(self, other):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def profile_summary(profiler, limit=20):
+    """
+    Functions with the highest cumulative time in a cProfile.Profile.
+
+    Returns:
+        list: Dicts with 'function', 'calls', 'own' and 'cumulative' seconds, None for other profilers
+    """
+    if not isinstance(profiler, cProfile.Profile):
+        return None
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{'function': f'{file}:{line}({function})', 'calls': calls, 'own': own, 'cumulative': cumulative}
+            for (file, line, function), (primitive_calls, calls, own, cumulative, callers) in rows]
+
+
+def make_profiler(profile):
+    """
+    Profiler for PDFReader's profile option: 'cprofile' for a new cProfile.Profile, or any object with
+    enable() and disable() methods (e.g. a wrapper around a sampling profiler), or None.
+
+    Only the page loop of the reader's process is profiled, so use workers=1 when profiling. write_file
+    saves a cProfile profile to '<output>.prof' (open it with pstats or snakeviz) and its top functions
+    in the metrics file.
+    """
+    if profile is None:
+        return None
+    if profile == 'cprofile':
+        return cProfile.Profile()
+    if not (hasattr(profile, 'enable') and hasattr(profile, 'disable')):
+        raise ValueError("profile must be 'cprofile' or an object with enable() and disable() methods")
+    return profile
+
+
+def write_metrics(path, metrics):
+    """Write a metrics dict as JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, indent=2)
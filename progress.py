@@ -0,0 +1,222 @@
+"""
+Progress reporting of reader runs, independent of the user interface.
+
+A reader reports to a Progress made by make_progress() from its progress option, or the app argument
+of a run: a Progress, a plain callback(done, total, message) for library and service use (CallbackProgress),
+or the GUI application (TkProgress). The terminal bar (TerminalProgress) is added when print_logs is set.
+Updates are coalesced by ThrottledProgress, to one per progress_interval seconds (0.1 by default) and/or per
+progress_percent percent, so fast page loops do not flood the Tk event queue.
+"""
+import time
+
+from alive_progress import alive_bar
+
+
+class Progress:
+    """
+    Receiver of extraction progress. Readers call start() once per run, update() after every page and
+    finish() at the end; message() shows a status text, like an error, without changing progress.
+
+    Subclass it for a new front end, or pass a plain function to the reader (see CallbackProgress).
+    """
+
+    def start(self, total):
+        pass
+
+    def update(self, done, total, message=''):
+        pass
+
+    def message(self, message):
+        pass
+
+    def finish(self):
+        pass
+
+
+class CallbackProgress(Progress):
+    """
+    Progress for library and service use: calls callback(done, total, message) on every update,
+    and callback(None, None, message) for status messages.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def update(self, done, total, message=''):
+        self.callback(done, total, message)
+
+    def message(self, message):
+        self.callback(None, None, message)
+
+
+class TkProgress(Progress):
+    """
+    Progress shown in Tk variables. Updates are posted to the Tk event loop with root.after, so they
+    can come from an extraction thread.
+    """
+
+    def __init__(self, root, status_var=None, progress_var=None):
+        """
+        Args:
+            root: Tk root window
+            status_var: StringVar for the status message
+            progress_var: DoubleVar for the percentage
+        """
+        self.root = root
+        self.status_var = status_var
+        self.progress_var = progress_var
+
+    @classmethod
+    def from_app(cls, app):
+        """From the GUI application (an object with root, status_var and progress_var)."""
+        return cls(app.root, getattr(app, 'status_var', None), getattr(app, 'progress_var', None))
+
+    def update(self, done, total, message=''):
+        percent = done / total * 100 if total else 100
+        self.root.after(0, self._set, message, percent)
+
+    def message(self, message):
+        self.root.after(0, self._set, message, None)
+
+    def _set(self, message, percent):
+        if self.status_var is not None and message:
+            self.status_var.set(message)
+        if self.progress_var is not None and percent is not None:
+            self.progress_var.set(percent)
+
+
+class TerminalProgress(Progress):
+    """Progress bar in the terminal (alive_progress)."""
+
+    def __init__(self):
+        self._context = None
+        self._bar = None
+        self._done = 0
+
+    def start(self, total):
+        self._context = alive_bar(total)
+        self._bar = self._context.__enter__()
+        self._done = 0
+
+    def update(self, done, total, message=''):
+        if self._bar is not None and done > self._done:
+            self._bar(done - self._done)
+            self._done = done
+
+    def message(self, message):
+        print(message)
+
+    def finish(self):
+        if self._context is not None:
+            context, self._context, self._bar = self._context, None, None
+            context.__exit__(None, None, None)
+
+
+class FanoutProgress(Progress):
+    """Send progress to several receivers, e.g. the terminal and the GUI."""
+
+    def __init__(self, receivers):
+        self.receivers = list(receivers)
+
+    def start(self, total):
+        for receiver in self.receivers:
+            receiver.start(total)
+
+    def update(self, done, total, message=''):
+        for receiver in self.receivers:
+            receiver.update(done, total, message)
+
+    def message(self, message):
+        for receiver in self.receivers:
+            receiver.message(message)
+
+    def finish(self):
+        for receiver in self.receivers:
+            receiver.finish()
+
+
+class ThrottledProgress(Progress):
+    """
+    Coalesce updates, so a fast page loop does not flood the receiver (e.g. the Tk event queue).
+
+    An update is passed on when min_interval seconds have passed since the last one passed on, or when
+    progress advanced by min_percent; the others are dropped, except the last one, which is passed on
+    before finish(). start(), message() and finish() are always passed on.
+    """
+
+    def __init__(self, receiver, min_interval=0.1, min_percent=None):
+        """
+        Args:
+            receiver (Progress): Receiver of the coalesced updates
+            min_interval (float): Seconds between updates, None to coalesce by percent only
+            min_percent (float): Progress between updates in percent, None to coalesce by time only
+        """
+        self.receiver = receiver
+        self.min_interval = min_interval
+        self.min_percent = min_percent
+        self._last_time = None
+        self._last_percent = None
+        self._pending = None
+
+    def start(self, total):
+        self._last_time = None
+        self._last_percent = None
+        self._pending = None
+        self.receiver.start(total)
+
+    def update(self, done, total, message=''):
+        now = time.monotonic()
+        percent = done / total * 100 if total else 100
+        if (self._last_time is None
+                or (self.min_interval is not None and now - self._last_time >= self.min_interval)
+                or (self.min_percent is not None and percent - self._last_percent >= self.min_percent)):
+            self._last_time = now
+            self._last_percent = percent
+            self._pending = None
+            self.receiver.update(done, total, message)
+        else:
+            self._pending = (done, total, message)
+
+    def message(self, message):
+        self.receiver.message(message)
+
+    def finish(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self.receiver.update(*pending)
+        self.receiver.finish()
+
+
+NULL_PROGRESS = Progress()
+
+
+def make_progress(target=None, terminal=False, min_interval=0.1, min_percent=None):
+    """
+    Progress receiver for a reader run.
+
+    Args:
+        target: A Progress, a function called as callback(done, total, message), the GUI application
+            (an object with root and status_var), or None
+        terminal (bool): Also show a progress bar in the terminal
+        min_interval (float): See ThrottledProgress
+        min_percent (float): See ThrottledProgress
+
+    Returns:
+        Progress: Throttled receiver, NULL_PROGRESS if there is nothing to report to
+    """
+    receivers = []
+    if terminal:
+        receivers.append(TerminalProgress())
+    if isinstance(target, Progress):
+        receivers.append(target)
+    elif hasattr(target, 'root') and hasattr(target, 'status_var'):
+        receivers.append(TkProgress.from_app(target))
+    elif callable(target):
+        receivers.append(CallbackProgress(target))
+    elif target is not None:
+        raise TypeError(f"Unsupported progress target: {type(target).__name__}")
+
+    if not receivers:
+        return NULL_PROGRESS
+    receiver = receivers[0] if len(receivers) == 1 else FanoutProgress(receivers)
+    return ThrottledProgress(receiver, min_interval, min_percent)
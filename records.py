@@ -0,0 +1,247 @@
+from array import array
+import struct
+
+
+class _Interner:
+    """Assign a stable integer id to each distinct value."""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def __call__(self, value):
+        key = (type(value), value)
+        value_id = self.ids.get(key)
+        if value_id is None:
+            value_id = self.ids[key] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+
+class ValueInterner:
+    """
+    Share equal tuples of strings (fonts, colors) between lines.
+
+    Most lines of a document use the same few fonts and colors, so every line refers to one stored
+    tuple instead of holding its own copies.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def __call__(self, values):
+        values = tuple(values)
+        return self._values.setdefault(values, values)
+
+
+class LineRecord:
+    """
+    One output line, as produced by both readers.
+
+    font and color are tuples of strings shared between lines (see ValueInterner), size is a tuple
+    and bbox a 4-tuple. The line becomes the output dict only when it is serialized (to_dict).
+    """
+
+    __slots__ = ('text', 'font', 'size', 'color', 'bbox', 'page', '_id')
+
+    def __init__(self, text, font, size, color, bbox, page, _id=0):
+        self.text = text
+        self.font = font
+        self.size = size
+        self.color = color
+        self.bbox = bbox
+        self.page = page
+        self._id = _id
+
+    @classmethod
+    def from_dict(cls, line):
+        return cls(line['text'], tuple(line['font']), tuple(line['size']), tuple(line['color']),
+                   tuple(line['bbox']), line['page'], line.get('_id', 0))
+
+    def to_dict(self):
+        """Output form: {'text', 'font', 'size', 'color', 'bbox', 'page', '_id'} with list values."""
+        return {
+            'text': self.text,
+            'font': list(self.font),
+            'size': list(self.size),
+            'color': list(self.color),
+            'bbox': list(self.bbox),
+            'page': self.page,
+            '_id': self._id,
+        }
+
+    def copy(self):
+        return LineRecord(self.text, self.font, self.size, self.color, self.bbox, self.page, self._id)
+
+    def __eq__(self, other):
+        if not isinstance(other, LineRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f'LineRecord({self.text!r}, page={self.page}, _id={self._id})'
+
+
+def _pack_strings(values):
+    encoded = [value.encode('utf-8', 'surrogatepass') for value in values]
+    ends = array('Q')
+    end = 0
+    for item in encoded:
+        end += len(item)
+        ends.append(end)
+    return ends.tobytes(), b''.join(encoded)
+
+
+def _unpack_strings(ends_bytes, blob):
+    ends = array('Q')
+    ends.frombytes(ends_bytes)
+    blob = bytes(blob)
+    values = []
+    start = 0
+    for end in ends:
+        values.append(blob[start:end].decode('utf-8', 'surrogatepass'))
+        start = end
+    return values
+
+
+class LineBatch:
+    """
+    Compact binary form of a list of LineRecords, used to send page results between processes.
+
+    Everything is stored in one bytes buffer: a concatenated text buffer, packed bbox floats,
+    page and '_id' integers, and interned font, size and color tables referenced by index.
+    Pickling a batch copies that buffer only, lines are decoded when iterated.
+    """
+
+    _MAGIC = b'LNB1'
+    # Section order inside the buffer
+    _SECTIONS = ('text', 'text_ends', 'bboxes', 'numbers', 'attr_counts', 'attr_ids',
+                 'font_ends', 'fonts', 'color_ends', 'colors', 'sizes', 'size_is_int')
+    _HEADER = struct.Struct('<4sQ' + 'Q' * len(_SECTIONS))
+
+    __slots__ = ('buffer',)
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __reduce__(self):
+        return LineBatch, (self.buffer,)
+
+    @classmethod
+    def from_lines(cls, lines):
+        """
+        Pack lines.
+
+        Args:
+            lines (list): LineRecords as built by the readers
+
+        Returns:
+            LineBatch
+        """
+        fonts = _Interner()
+        colors = _Interner()
+        sizes = _Interner()
+
+        texts = []
+        text_ends = array('Q')
+        bboxes = array('d')
+        numbers = array('q')
+        attr_counts = array('I')
+        attr_ids = array('I')
+
+        text_end = 0
+        for line in lines:
+            text = line.text.encode('utf-8', 'surrogatepass')
+            texts.append(text)
+            text_end += len(text)
+            text_ends.append(text_end)
+            bboxes.extend(line.bbox)
+            numbers.append(line.page)
+            numbers.append(line._id)
+            for values, interner in ((line.font, fonts), (line.size, sizes), (line.color, colors)):
+                attr_counts.append(len(values))
+                attr_ids.extend(interner(value) for value in values)
+
+        font_ends, font_blob = _pack_strings(fonts.values)
+        color_ends, color_blob = _pack_strings(colors.values)
+        size_values = array('d', (float(size) for size in sizes.values))
+        size_is_int = bytes(isinstance(size, int) for size in sizes.values)
+
+        sections = [b''.join(texts), text_ends.tobytes(), bboxes.tobytes(), numbers.tobytes(),
+                    attr_counts.tobytes(), attr_ids.tobytes(), font_ends, font_blob, color_ends, color_blob,
+                    size_values.tobytes(), size_is_int]
+        header = cls._HEADER.pack(cls._MAGIC, len(lines), *(len(section) for section in sections))
+        return cls(header + b''.join(sections))
+
+    def _sections(self):
+        magic, count, *lengths = self._HEADER.unpack_from(self.buffer)
+        if magic != self._MAGIC:
+            raise ValueError('Not a line batch buffer')
+        view = memoryview(self.buffer)
+        sections = {}
+        offset = self._HEADER.size
+        for name, length in zip(self._SECTIONS, lengths):
+            sections[name] = view[offset:offset + length]
+            offset += length
+        return count, sections
+
+    def __len__(self):
+        return self._HEADER.unpack_from(self.buffer)[1]
+
+    def iter_lines(self, id_offset=0):
+        """
+        Decode lines one by one.
+
+        Args:
+            id_offset (int): Added to every '_id'
+
+        Yields:
+            LineRecord: Line as it was packed, font and color tuples shared between lines
+        """
+        count, sections = self._sections()
+
+        def unpack(name, typecode):
+            values = array(typecode)
+            values.frombytes(sections[name])
+            return values
+
+        shared = ValueInterner()
+        fonts = _unpack_strings(sections['font_ends'], sections['fonts'])
+        colors = _unpack_strings(sections['color_ends'], sections['colors'])
+        sizes = [int(size) if is_int else size
+                 for size, is_int in zip(unpack('sizes', 'd'), bytes(sections['size_is_int']))]
+
+        text = sections['text']
+        text_ends = unpack('text_ends', 'Q')
+        bboxes = unpack('bboxes', 'd')
+        numbers = unpack('numbers', 'q')
+        attr_counts = unpack('attr_counts', 'I')
+        attr_ids = unpack('attr_ids', 'I')
+
+        text_start = 0
+        attr_pos = 0
+        for i in range(count):
+            text_end = text_ends[i]
+            attrs = []
+            for table, attr_count in zip((fonts, sizes, colors), attr_counts[i * 3:i * 3 + 3]):
+                attrs.append(tuple([table[value_id] for value_id in attr_ids[attr_pos:attr_pos + attr_count]]))
+                attr_pos += attr_count
+            yield LineRecord(
+                bytes(text[text_start:text_end]).decode('utf-8', 'surrogatepass'),
+                shared(attrs[0]),
+                attrs[1],
+                shared(attrs[2]),
+                tuple(bboxes[i * 4:i * 4 + 4]),
+                numbers[i * 2],
+                numbers[i * 2 + 1] + id_offset,
+            )
+            text_start = text_end
+
+    def __iter__(self):
+        return self.iter_lines()
+
+
+def pack_page_lines(result):
+    """Pack a (lines, id_count) page result for the trip back from a worker process."""
+    lines, id_count = result
+    return LineBatch.from_lines(lines), id_count
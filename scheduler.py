@@ -0,0 +1,89 @@
+import re
+
+
+class PageScheduler:
+    """
+    Plan how pages are distributed between worker processes.
+
+    Page cost is estimated from the size of the page content streams, which is read from the PDF
+    without parsing any text. Pages are then cut into contiguous chunks of roughly equal cost -
+    several chunks per worker, so a worker that finishes early picks up the next chunk instead of waiting.
+
+    Chunks are submitted in page order, at most max_in_flight at a time, so the first pages reach
+    the caller as soon as they are done and finished chunks never pile up waiting for an earlier one.
+    """
+
+    # Fixed cost of a page (load, fonts, resources) in content stream bytes
+    PAGE_OVERHEAD = 2048
+
+    def __init__(self, workers, chunks_per_worker=4, in_flight_per_worker=2):
+        self.workers = max(1, workers)
+        self.chunks_per_worker = max(1, chunks_per_worker)
+        # Chunks submitted but not yet read by the caller
+        self.max_in_flight = self.workers * max(1, in_flight_per_worker)
+
+    def estimate_costs(self, doc, page_nums):
+        """
+        Estimate the relative extraction cost of pages.
+
+        Args:
+            doc: Opened fitz document
+            page_nums: Zero-based page numbers
+
+        Returns:
+            dict: page_num -> estimated cost
+        """
+        costs = {}
+        for page_num in page_nums:
+            cost = self.PAGE_OVERHEAD
+            try:
+                for xref in doc.load_page(page_num).get_contents():
+                    cost += self._stream_length(doc, xref)
+            except Exception:
+                pass
+            costs[page_num] = cost
+        return costs
+
+    @staticmethod
+    def _stream_length(doc, xref):
+        # /Length is usually a direct number, so no stream data has to be read
+        kind, value = doc.xref_get_key(xref, 'Length')
+        if kind == 'int':
+            return int(value)
+        match = re.match(r'(\d+) \d+ R', value or '')
+        if kind == 'xref' and match:
+            length = doc.xref_object(int(match.group(1)), compressed=True).strip()
+            if length.isdigit():
+                return int(length)
+        return len(doc.xref_stream_raw(xref) or b'')
+
+    def plan(self, page_nums, costs):
+        """
+        Split pages into contiguous chunks of similar total cost.
+
+        Args:
+            page_nums: Zero-based page numbers in output order
+            costs: page_num -> estimated cost
+
+        Returns:
+            list: Chunks (lists of page numbers), in page order
+        """
+        if not page_nums:
+            return []
+        chunk_count = min(self.workers * self.chunks_per_worker, len(page_nums))
+        target = sum(costs[page_num] for page_num in page_nums) / chunk_count
+
+        chunks = []
+        chunk = []
+        chunk_cost = 0
+        for page_num in page_nums:
+            cost = costs[page_num]
+            # Close the chunk before a page that would overshoot the target more than it undershoots
+            if chunk and chunk_cost + cost - target > target - chunk_cost:
+                chunks.append(chunk)
+                chunk = []
+                chunk_cost = 0
+            chunk.append(page_num)
+            chunk_cost += cost
+        chunks.append(chunk)
+        return chunks
@@ -26,6 +26,9 @@ class Settings:
             'y_tolerance': 3,
             'x_tolerance': 1,
             'borders': [None, None, None, None],  # [header, left, right, footer]
+            'workers': 1,
+            'cache': False,
+            'report_skipped': False,
         }
 
     def load_settings(self):
@@ -0,0 +1,71 @@
+import re
+
+from formatting import BOLD, ITALIC, SUP
+
+
+class StyleResolver:
+    """
+    Per-document cache of font lookups.
+
+    A document has only a few dozen distinct fonts and (font, size, flags) combinations, so the style
+    bits, the normalized font id used to compare spans and the cleaned font name are each computed
+    once per distinct value instead of once per span.
+    """
+
+    # PyMuPDF span flags: bold (2**4), synthetic bold (2**6), italic (2**1), synthetic italic (2**7)
+    BOLD_FLAGS = 2 ** 4 | 2 ** 6
+    ITALIC_FLAGS = 2 ** 1 | 2 ** 7
+
+    def __init__(self, bold_fonts, italic_fonts, sup_size, font_suffix_pattern=r'\+\d+'):
+        """
+        Args:
+            bold_fonts (list): Substrings of bold font names
+            italic_fonts (list): Substrings of italic font names
+            sup_size (float): Runs smaller than this are superscript
+            font_suffix_pattern (str): Regex removed from font names before comparing them
+        """
+        self.bold_fonts = list(bold_fonts)
+        self.italic_fonts = list(italic_fonts)
+        self.sup_size = sup_size
+        self.font_suffix_pattern = re.compile(font_suffix_pattern)
+
+        self._styles = {}
+        self._font_ids = {}
+        self._normalized_ids = {}
+        self._clean_names = {}
+
+    def get_style(self, font, size, flags=0):
+        """
+        Style bits (BOLD, ITALIC, SUP) of a run.
+
+        Bold and italic come from the font name markers or from PyMuPDF flags, including the synthetic
+        ones - same as checking flags_decomposer(flags) for 'bold' and 'italic'.
+        """
+        key = (font, size, flags)
+        style = self._styles.get(key)
+        if style is None:
+            style = 0
+            if size < self.sup_size:
+                style |= SUP
+            if any(marker in font for marker in self.bold_fonts) or flags & self.BOLD_FLAGS:
+                style |= BOLD
+            if any(marker in font for marker in self.italic_fonts) or flags & self.ITALIC_FLAGS:
+                style |= ITALIC
+            self._styles[key] = style
+        return style
+
+    def get_font_id(self, font):
+        """Integer id of a font with font_suffix_pattern removed, e.g. 'AdvOT863180fb+20' and 'AdvOT863180fb' share one."""
+        font_id = self._font_ids.get(font)
+        if font_id is None:
+            normalized = self.font_suffix_pattern.sub('', font) if '+' in font else font
+            font_id = self._normalized_ids.setdefault(normalized, len(self._normalized_ids))
+            self._font_ids[font] = font_id
+        return font_id
+
+    def get_clean_name(self, font):
+        """Font name without the subset prefix, 'NJHPPA+AdvOT863180fb' -> 'AdvOT863180fb'."""
+        name = self._clean_names.get(font)
+        if name is None:
+            name = self._clean_names[font] = font.partition('+')[2] if '+' in font else font
+        return name
@@ -43,6 +43,9 @@ class PDFReaderGUI:
         self.html_like_var = BooleanVar(value=self.settings.get_setting("html_like", False))
         self.reader_type_var = StringVar(value=self.settings.get_setting("reader_type", "plumber"))
         self.sup_size_var = tk.DoubleVar(value=self.settings.get_setting("sup_size", 6))
+        self.workers_var = IntVar(value=self.settings.get_setting("workers", 1))
+        self.cache_var = BooleanVar(value=self.settings.get_setting("cache", False))
+        self.report_skipped_var = BooleanVar(value=self.settings.get_setting("report_skipped", False))
 
         self.extra_settings_visible = BooleanVar(value=False)
         self.x_tolerance_var = tk.DoubleVar(value=self.settings.get_setting("x_tolerance", 1))
@@ -109,6 +112,9 @@ class PDFReaderGUI:
             self.settings.update_setting("html_like", self.html_like_var.get())
             self.settings.update_setting("y_tolerance", self.y_tolerance_var.get())
             self.settings.update_setting("x_tolerance", self.x_tolerance_var.get())
+            self.settings.update_setting("workers", self.workers_var.get())
+            self.settings.update_setting("cache", self.cache_var.get())
+            self.settings.update_setting("report_skipped", self.report_skipped_var.get())
 
 
             # Border settings
@@ -177,6 +183,11 @@ class PDFReaderGUI:
         extract_filetype_txt = ttk.Radiobutton(extract_filetype_frame, text="txt", variable=self.extract_filetype_var, value="txt")
         extract_filetype_txt.pack(side=tk.LEFT, padx=5)
 
+        # parquet and arrow need pyarrow; sqlite adds the document to a searchable database
+        for filetype in ("parquet", "arrow", "sqlite"):
+            ttk.Radiobutton(extract_filetype_frame, text=filetype, variable=self.extract_filetype_var,
+                            value=filetype).pack(side=tk.LEFT, padx=5)
+
         self.extract_filetype_var.trace_add("write", self._on_filetype_change)
 
         # Page Range Section
@@ -254,6 +265,12 @@ class PDFReaderGUI:
         html_check = ttk.Checkbutton(format_frame, text="HTML-like formatting", variable=self.html_like_var)
         html_check.pack(side=tk.LEFT, padx=5)
 
+        cache_check = ttk.Checkbutton(format_frame, text="Cache results", variable=self.cache_var)
+        cache_check.pack(side=tk.LEFT, padx=5)
+
+        report_skipped_check = ttk.Checkbutton(format_frame, text="Report skipped text", variable=self.report_skipped_var)
+        report_skipped_check.pack(side=tk.LEFT, padx=5)
+
         sup_frame = ttk.Frame(options_frame)
         sup_frame.pack(fill=tk.X, pady=5)
 
@@ -263,6 +280,19 @@ class PDFReaderGUI:
         sup_size = ttk.Entry(sup_frame, textvariable=self.sup_size_var, width=5)
         sup_size.pack(side=tk.LEFT, padx=5)
 
+        # Workers
+        workers_frame = ttk.Frame(options_frame)
+        workers_frame.pack(fill=tk.X, pady=5)
+
+        workers_label = ttk.Label(workers_frame, text="Worker processes:")
+        workers_label.pack(side=tk.LEFT, padx=5)
+
+        workers_entry = ttk.Entry(workers_frame, textvariable=self.workers_var, width=5)
+        workers_entry.pack(side=tk.LEFT, padx=5)
+
+        workers_help = ttk.Label(workers_frame, text="(1 - process pages one by one)")
+        workers_help.pack(side=tk.LEFT, padx=5)
+
         # Extra Settings Section (collapsible)
         extra_toggle_frame = ttk.Frame(self.scrollable_frame, relief="flat", borderwidth=0)
         extra_toggle_frame.pack(fill=tk.X, pady=5)
@@ -551,6 +581,9 @@ class PDFReaderGUI:
                 'borders': borders,
                 'x_tolerance': x_tolerance,
                 'y_tolerance': y_tolerance,
+                'workers': self.workers_var.get(),
+                'cache': self.cache_var.get(),
+                'report_skipped': self.report_skipped_var.get(),
                 'reader_type': self.reader_type_var.get()
             }
 
@@ -0,0 +1,596 @@
+import gzip
+import io
+import json
+import os
+import queue
+import threading
+import time
+
+from records import LineRecord
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# Output file buffer, large enough that writes to network storage are few
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+
+def open_output(path, compress_level=None):
+    """
+    Open an output file for binary writing, compressed according to its extension.
+
+    '.gz' is written with gzip, '.zst' and '.zstd' with Zstandard (needs the zstandard package),
+    anything else as a plain buffered file.
+
+    Args:
+        path (str): Output file path
+        compress_level (int): Compression level, library default for None (gzip 6, zstd 3)
+
+    Returns:
+        Binary file object, closing it finishes the compressed stream
+    """
+    lower = str(path).lower()
+    if lower.endswith('.gz'):
+        level = 6 if compress_level is None else compress_level
+        return gzip.open(path, 'wb', compresslevel=level)
+    if lower.endswith(('.zst', '.zstd')):
+        if zstandard is None:
+            raise ImportError("Writing .zst output needs the zstandard package (pip install zstandard)")
+        level = 3 if compress_level is None else compress_level
+        return zstandard.ZstdCompressor(level=level).stream_writer(open(path, 'wb'), closefd=True)
+    return open(path, 'wb', buffering=OUTPUT_BUFFER_SIZE)
+
+
+class LineEncoder:
+    """
+    Encode batches of output items to UTF-8 bytes, one item per line.
+
+    JSON is encoded with orjson when it is installed (about 10x faster; compact, no spaces after separators),
+    otherwise with one reused stdlib encoder, which writes the same text as json.dumps(item, ensure_ascii=False);
+    write_file(json_encoder='json') keeps that output with orjson installed. Items that are not dicts, like
+    LineRecord, are encoded as their to_dict(). python -m benchmarks.bench_writers compares the encoders.
+    """
+
+    def __init__(self, filetype='jsonl', json_encoder='auto', newline=os.linesep):
+        """
+        Args:
+            filetype (str): 'jsonl' for dicts, 'txt' for strings
+            json_encoder (str): 'orjson', 'json' or 'auto' (orjson if installed)
+            newline (str): Line end written for '\n', the platform one like a file opened in text mode
+        """
+        if json_encoder == 'auto':
+            json_encoder = 'orjson' if orjson is not None else 'json'
+        if json_encoder == 'orjson' and orjson is None:
+            raise ImportError("json_encoder='orjson' needs the orjson package (pip install orjson)")
+
+        self.filetype = filetype
+        self.json_encoder = json_encoder if filetype == 'jsonl' else None
+        self.newline = newline
+        self._encode = json.JSONEncoder(ensure_ascii=False, default=_to_dict).encode
+
+    def encode_batch(self, items):
+        """
+        Args:
+            items (list): Line dicts for 'jsonl', strings for 'txt'
+
+        Returns:
+            bytes: Encoded lines, each ending with a newline
+        """
+        newline = self.newline
+        if self.filetype != 'jsonl':
+            text = ''.join([item + '\n' for item in items])
+            if newline != '\n':
+                text = text.replace('\n', newline)
+            return text.encode('utf-8')
+        if self.json_encoder == 'orjson':
+            dumps = orjson.dumps
+            option = orjson.OPT_APPEND_NEWLINE
+            data = b''.join([dumps(item, default=_to_dict, option=option) for item in items])
+            # Newlines inside strings are escaped, so only line ends are replaced
+            return data if newline == '\n' else data.replace(b'\n', newline.encode('ascii'))
+        encode = self._encode
+        return ''.join([encode(item) + newline for item in items]).encode('utf-8')
+
+
+class StyleTableEncoder(LineEncoder):
+    """
+    Encode LineRecords as JSONL with a document-level table of fonts, sizes and colors.
+
+    Each distinct (fonts, sizes, colors) combination of a line is a style, and lines refer to
+    their style by index instead of repeating font names and colors:
+
+        {"format": "lines-with-styles", "version": 1}
+        {"fonts": ["MinionPro-Regular"], "sizes": [9.5], "colors": ["0"], "styles": [[[0], [0], [0]]]}
+        ["Text of the line", 0, [56.7, 72.1, 301.2, 83.3], 0, 0]
+
+    Line rows are [text, style, bbox, page, _id]. The file is written in one pass, so the table
+    grows as the document is read: before a batch of rows, one table line adds the fonts, sizes,
+    colors and styles first used in that batch; ids continue from the previous table lines.
+    Uncompressed files are about a third smaller than plain JSONL. read_lines converts the file back
+    to line dicts.
+    """
+
+    FORMAT = 'lines-with-styles'
+    VERSION = 1
+
+    def __init__(self, json_encoder='auto', newline=os.linesep):
+        """
+        Args:
+            json_encoder (str): 'orjson', 'json' or 'auto' (orjson if installed)
+            newline (str): Line end written for '\n'
+        """
+        super().__init__('jsonl', json_encoder, newline)
+        self._fonts = _ValueIds()
+        self._sizes = _ValueIds()
+        self._colors = _ValueIds()
+        self._styles = {}
+        self._new_styles = []
+        self._started = False
+
+    def _get_style(self, line):
+        # Sizes 10 and 10.0 are equal but written differently
+        key = (line.font, line.size, line.color, tuple(map(type, line.size)))
+        style = self._styles.get(key)
+        if style is None:
+            style = self._styles[key] = len(self._styles)
+            self._new_styles.append([[self._fonts(value) for value in line.font],
+                                     [self._sizes(value) for value in line.size],
+                                     [self._colors(value) for value in line.color]])
+        return style
+
+    def encode_batch(self, items):
+        """
+        Args:
+            items (list): LineRecords (or line dicts)
+
+        Returns:
+            bytes: Table line if new styles were used, then one row per line
+        """
+        rows = []
+        get_style = self._get_style
+        for line in items:
+            if isinstance(line, dict):
+                line = LineRecord.from_dict(line)
+            rows.append((line.text, get_style(line), line.bbox, line.page, line._id))
+
+        header = []
+        if not self._started:
+            header.append({'format': self.FORMAT, 'version': self.VERSION})
+            self._started = True
+        if self._new_styles:
+            header.append({
+                'fonts': self._fonts.pop_new(),
+                'sizes': self._sizes.pop_new(),
+                'colors': self._colors.pop_new(),
+                'styles': self._new_styles,
+            })
+            self._new_styles = []
+        return super().encode_batch(header + rows)
+
+
+class _ValueIds:
+    """Ids of distinct values in first-use order; 10 and 10.0 are different values."""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+        self._written = 0
+
+    def __call__(self, value):
+        key = (type(value), value)
+        value_id = self.ids.get(key)
+        if value_id is None:
+            value_id = self.ids[key] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def pop_new(self):
+        """Values added since the last call."""
+        new = self.values[self._written:]
+        self._written = len(self.values)
+        return new
+
+
+def open_input(path):
+    """Open a file written by write_file for binary reading, decompressed according to its extension."""
+    lower = str(path).lower()
+    if lower.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if lower.endswith(('.zst', '.zstd')):
+        if zstandard is None:
+            raise ImportError("Reading .zst files needs the zstandard package (pip install zstandard)")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return io.BufferedReader(reader, buffer_size=OUTPUT_BUFFER_SIZE)
+    return open(path, 'rb', buffering=OUTPUT_BUFFER_SIZE)
+
+
+def read_lines(path):
+    """
+    Read a JSONL output file as line dicts.
+
+    Files written with a style table (StyleTableEncoder) are converted back to the usual
+    {'text', 'font', 'size', 'color', 'bbox', 'page', '_id'} dicts, plain JSONL files are read as they are.
+
+    Args:
+        path (str): Output file, may be compressed ('.gz', '.zst')
+
+    Yields:
+        dict: One line
+    """
+    loads = orjson.loads if orjson is not None else json.loads
+    fonts, sizes, colors = [], [], []
+    styles = []
+    styled = False
+    with open_input(path) as f:
+        for raw_line in f:
+            if not raw_line.strip():
+                continue
+            item = loads(raw_line)
+            if styled and type(item) is list:
+                text, style, bbox, page, _id = item
+                font, size, color = styles[style]
+                yield {'text': text, 'font': font.copy(), 'size': size.copy(), 'color': color.copy(),
+                       'bbox': bbox, 'page': page, '_id': _id}
+            elif styled:
+                fonts += item.get('fonts', [])
+                sizes += item.get('sizes', [])
+                colors += item.get('colors', [])
+                for font_ids, size_ids, color_ids in item.get('styles', []):
+                    styles.append(([fonts[i] for i in font_ids], [sizes[i] for i in size_ids],
+                                   [colors[i] for i in color_ids]))
+            elif item.get('format') == StyleTableEncoder.FORMAT and not fonts:
+                if item.get('version') != StyleTableEncoder.VERSION:
+                    raise ValueError(f"Unsupported style table version {item.get('version')} in {path}")
+                styled = True
+            else:
+                yield item
+
+
+def _to_dict(item):
+    to_dict = getattr(item, 'to_dict', None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(item).__name__} is not JSON serializable")
+    return to_dict()
+
+
+def write_batches(file, items, encode_batch, batch_size=256):
+    """
+    Write items in batches, one write per batch.
+
+    Args:
+        file: Binary file object
+        items: Iterable of items
+        encode_batch: Function converting a list of items to bytes
+        batch_size (int): Number of items per batch
+    """
+    batch = []
+    try:
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                file.write(encode_batch(batch))
+                batch = []
+    finally:
+        # The last partial batch is kept when items raises, e.g. when the run is cancelled
+        if batch:
+            file.write(encode_batch(batch))
+
+
+class BackgroundWriter:
+    """
+    Encode and write items on a separate thread.
+
+    The producer (page extraction) calls put(); items are grouped into batches and passed to the
+    writer thread through a bounded queue. When the queue is full, put() waits for the writer,
+    so memory stays bounded when writing is slower than extraction.
+
+    Use as a context manager:
+        with BackgroundWriter(f, LineEncoder('jsonl').encode_batch) as writer:
+            for item in items:
+                writer.put(item)
+        print(writer.stats())
+    """
+
+    _STOP = object()
+
+    def __init__(self, file, encode_batch, queue_size=16, batch_size=256):
+        """
+        Args:
+            file: Open file object to write to
+            encode_batch: Function converting a list of items to the data written to the file
+            queue_size (int): Maximum number of batches waiting for the writer
+            batch_size (int): Number of items per batch
+        """
+        self.file = file
+        self.encode_batch = encode_batch
+        self.batch_size = max(1, batch_size)
+
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._batch = []
+        self._thread = threading.Thread(target=self._run, name='BackgroundWriter', daemon=True)
+        self._error = None
+
+        self.items = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self.producer_stall_time = 0.0
+        self.writer_idle_time = 0.0
+        self.writer_busy_time = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Items already produced are written even if the producer failed
+        self.close()
+        return False
+
+    def start(self):
+        self._thread.start()
+
+    def put(self, item):
+        self._batch.append(item)
+        if len(self._batch) >= self.batch_size:
+            self._put_batch()
+
+    def _put_batch(self):
+        batch, self._batch = self._batch, []
+        depth = self._queue.qsize()
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._depth_total += depth
+
+        self._enqueue(batch)
+        self.items += len(batch)
+        self.batches += 1
+
+    def _enqueue(self, batch):
+        start = time.perf_counter()
+        while True:
+            self._raise_writer_error()
+            try:
+                self._queue.put(batch, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self.producer_stall_time += time.perf_counter() - start
+
+    def _raise_writer_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Writer thread failed: {self._error}") from self._error
+
+    def close(self):
+        """Write the remaining items and stop the writer thread."""
+        if not self._thread.is_alive():
+            self._raise_writer_error()
+            return
+        if self._batch:
+            self._put_batch()
+        self._enqueue(self._STOP)
+        self._thread.join()
+        self._raise_writer_error()
+
+    def _run(self):
+        encode_batch = self.encode_batch
+        write = self.file.write
+        try:
+            while True:
+                start = time.perf_counter()
+                batch = self._queue.get()
+                got = time.perf_counter()
+                self.writer_idle_time += got - start
+                if batch is self._STOP:
+                    break
+                write(encode_batch(batch))
+                self.writer_busy_time += time.perf_counter() - got
+            self.file.flush()
+        except Exception as e:
+            self._error = e
+            # Unblock a producer waiting on a full queue
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+    def stats(self):
+        """
+        Queue and timing statistics, for sizing queue_size and batch_size.
+
+        Returns:
+            dict
+        """
+        return {
+            'items': self.items,
+            'batches': self.batches,
+            'queue_size': self._queue.maxsize,
+            'batch_size': self.batch_size,
+            'max_queue_depth': self.max_queue_depth,
+            'mean_queue_depth': self._depth_total / self.batches if self.batches else 0,
+            'producer_stall_time': self.producer_stall_time,
+            'writer_busy_time': self.writer_busy_time,
+            'writer_idle_time': self.writer_idle_time,
+        }
+
+
+class PageGroupWriter:
+    """
+    Base of the writers that buffer LineRecords and write them in groups of whole pages.
+
+    Lines are written once at least rows_per_group lines are buffered and the next page starts, so
+    memory is bounded by a group of pages and a page is never split between groups. close() writes
+    the buffered lines even when the producer failed. Subclasses implement start(), write_group()
+    and finish().
+    """
+
+    def __init__(self, rows_per_group):
+        self.rows_per_group = max(1, rows_per_group)
+        self.row_groups = 0
+        self.rows = 0
+        self._lines = []
+        self._started = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def open(self):
+        self.start()
+        self._started = True
+
+    def write(self, line):
+        """Buffer one LineRecord, writing the buffered lines first if a new page starts a full group."""
+        if len(self._lines) >= self.rows_per_group and line.page != self._lines[-1].page:
+            self.flush()
+        self._lines.append(line)
+
+    def flush(self):
+        """Write the buffered lines as one group."""
+        if not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        self.write_group(lines)
+        self.row_groups += 1
+        self.rows += len(lines)
+
+    def close(self):
+        """Write the remaining lines and finish the output."""
+        if not self._started:
+            return
+        try:
+            self.flush()
+        finally:
+            self._started = False
+            self.finish()
+
+    def start(self):
+        raise NotImplementedError
+
+    def write_group(self, lines):
+        raise NotImplementedError
+
+    def finish(self):
+        raise NotImplementedError
+
+
+class ArrowLineWriter(PageGroupWriter):
+    """
+    Write LineRecords column by column to Parquet or Arrow IPC (needs the pyarrow package).
+
+    Columns: text (string), font and color (lists of dictionary-encoded strings), size (list of
+    float64), bbox (fixed-size list of 4 float64), page (int32) and _id (int64). Font and color
+    dictionaries are shared by the whole document.
+
+    Each group of pages (see PageGroupWriter) is one row group (Parquet) or record batch (Arrow).
+
+    Use as a context manager:
+        with ArrowLineWriter('out.parquet', 'parquet') as writer:
+            for record in reader.iter_records():
+                writer.write(record)
+    """
+
+    def __init__(self, path, filetype='parquet', rows_per_group=65536, compress_level=None):
+        """
+        Args:
+            path (str): Output file path
+            filetype (str): 'parquet' or 'arrow' (Arrow IPC file)
+            rows_per_group (int): Minimum number of lines per row group, except the last one
+            compress_level (int): Parquet is written with zstd at this level (library default if None),
+                Arrow files are uncompressed unless a level is given
+        """
+        if pyarrow is None:
+            raise ImportError(f"Writing {filetype} output needs the pyarrow package (pip install pyarrow)")
+        if filetype not in ('parquet', 'arrow'):
+            raise ValueError(f"Unsupported filetype {filetype!r}, expected 'parquet' or 'arrow'")
+
+        super().__init__(rows_per_group)
+        self.path = path
+        self.filetype = filetype
+        self.compress_level = compress_level
+        self.schema = pyarrow.schema([
+            ('text', pyarrow.string()),
+            ('font', pyarrow.list_(pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))),
+            ('size', pyarrow.list_(pyarrow.float64())),
+            ('color', pyarrow.list_(pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))),
+            ('bbox', pyarrow.list_(pyarrow.float64(), 4)),
+            ('page', pyarrow.int32()),
+            ('_id', pyarrow.int64()),
+        ])
+
+        self._fonts = _ValueIds()
+        self._colors = _ValueIds()
+        self._writer = None
+        self._sink = None
+
+    def start(self):
+        if self.filetype == 'parquet':
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self.path, self.schema, compression='zstd', compression_level=self.compress_level)
+        else:
+            options = pyarrow.ipc.IpcWriteOptions(
+                compression=None if self.compress_level is None else pyarrow.Codec('zstd', self.compress_level),
+                emit_dictionary_deltas=True)
+            self._sink = pyarrow.OSFile(str(self.path), 'wb')
+            self._writer = pyarrow.ipc.new_file(self._sink, self.schema, options=options)
+
+    def write_group(self, lines):
+        font_offsets, font_ids = self._encode_lists([line.font for line in lines], self._fonts)
+        color_offsets, color_ids = self._encode_lists([line.color for line in lines], self._colors)
+        size_offsets, sizes = self._encode_lists([line.size for line in lines], float)
+        bboxes = [value for line in lines for value in line.bbox]
+
+        def dictionary_list(offsets, ids, values):
+            indices = pyarrow.DictionaryArray.from_arrays(
+                pyarrow.array(ids, pyarrow.int32()), pyarrow.array(values.values, pyarrow.string()))
+            return pyarrow.ListArray.from_arrays(pyarrow.array(offsets, pyarrow.int32()), indices)
+
+        batch = pyarrow.RecordBatch.from_arrays([
+            pyarrow.array([line.text for line in lines], pyarrow.string()),
+            dictionary_list(font_offsets, font_ids, self._fonts),
+            pyarrow.ListArray.from_arrays(pyarrow.array(size_offsets, pyarrow.int32()),
+                                          pyarrow.array(sizes, pyarrow.float64())),
+            dictionary_list(color_offsets, color_ids, self._colors),
+            pyarrow.FixedSizeListArray.from_arrays(pyarrow.array(bboxes, pyarrow.float64()), 4),
+            pyarrow.array([line.page for line in lines], pyarrow.int32()),
+            pyarrow.array([line._id for line in lines], pyarrow.int64()),
+        ], schema=self.schema)
+
+        if self.filetype == 'parquet':
+            self._writer.write_batch(batch, row_group_size=len(lines))
+        else:
+            self._writer.write_batch(batch)
+
+    @staticmethod
+    def _encode_lists(lists, encode):
+        offsets = [0]
+        values = []
+        for items in lists:
+            values.extend(map(encode, items))
+            offsets.append(len(values))
+        return offsets, values
+
+    def finish(self):
+        self._writer.close()
+        self._writer = None
+        if self.filetype == 'arrow':
+            self._sink.close()